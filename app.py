@@ -1,23 +1,182 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, g
 from flask_cors import CORS
 from controllers.userController import UserController
 from controllers.transactionController import TransactionController
-from database.connection import create_connection
+from controllers.idempotencyController import IdempotencyController
+from models.kiloPriceModel import kilo_price_index
+from models import orderStatusModel as order_status
+from database.connection import create_connection, fetch_all, fetch_one, pool_stats, add_acquire_observer
+from database.pagination import parse_limit, encode_cursor, decode_cursor, keyset_page
+from database.projection import FieldSet
+from database.instrumentation import init_query_stats, query_stats
+from utils.serialization import jsonify, init_json, dumps_line, encode_value
+from utils.compression import init_compression
+from utils.cache import TTLCache
+from utils.invalidation import invalidation_bus
+from utils.auth import token_cache
+from utils.conditional import conditional, payload_digest
+from utils.hashing import password_hasher, HasherBusy
+from utils.realtime import socketio_queue_options, room_event_log, emit_scheduler, BATCH_SUFFIX, add_emit_observer
+from utils.metrics import registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+import logging
+import os
 from functools import wraps
+import hashlib
+import hmac
+import csv
+import io
+import time
 import jwt
 from flask_socketio import SocketIO, emit, join_room 
 from datetime import datetime, timedelta
-from decimal import Decimal
 import json
 
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    format='%(asctime)s %(levelname)s %(name)s %(message)s'
+)
+auth_logger = logging.getLogger('labaride.auth')
+transaction_logger = logging.getLogger('labaride.transactions')
+idempotency_logger = logging.getLogger('labaride.idempotency')
+
 app = Flask(__name__)
+init_json(app)
+init_compression(app)
+init_query_stats(app)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# SOCKETIO_MESSAGE_QUEUE lets emits reach sockets held by other workers,
+# see utils/realtime.py for the options and the sticky session setup
+# SOCKETIO_ASYNC_MODE=gevent is the production mode, see wsgi.py
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode=os.getenv('SOCKETIO_ASYNC_MODE', 'threading'),
+    **socketio_queue_options()
+)
 app.config['SECRET_KEY'] = '1025'
 
+# Prometheus metrics for /metrics. Values are per worker process, so with
+# several gunicorn workers each scrape only sees the one that answered.
+http_latency = registry.histogram(
+    'labaride_http_request_duration_seconds', 'Request latency by route', ('method', 'route'))
+http_responses = registry.counter(
+    'labaride_http_responses_total', 'Responses by route and status code', ('method', 'route', 'status'))
+db_acquire_latency = registry.histogram(
+    'labaride_db_pool_acquire_seconds', 'Time spent waiting for a pooled MySQL connection',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0))
+socket_emits = registry.counter(
+    'labaride_socketio_emits_total', 'Socket.IO emits started in this worker', ('event',))
+password_hash_latency = registry.histogram(
+    'labaride_password_hash_seconds', 'bcrypt time per hash or check',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+password_hash_wait = registry.histogram(
+    'labaride_password_hash_wait_seconds', 'Time bcrypt jobs spent queued for a worker thread',
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+
+def _socket_rooms():
+    return socketio.server.manager.rooms.get('/', {})
+
+def _socket_connections():
+    # Every connected sid is in the None room of its namespace
+    return len(_socket_rooms().get(None, ()))
+
+def _socket_room_counts():
+    counts = {}
+    for room, members in list(_socket_rooms().items()):
+        # Skip the None room and each sid's private room
+        if room is None or room in members:
+            continue
+        kind = room.split('_', 1)[0] if room.startswith(('shop_', 'user_')) else 'other'
+        if room.endswith(BATCH_SUFFIX):
+            kind += BATCH_SUFFIX
+        counts[(kind,)] = counts.get((kind,), 0) + 1
+    return counts
+
+registry.gauge_callback(
+    'labaride_socketio_connections', 'Connected Socket.IO clients in this worker', _socket_connections)
+registry.gauge_callback(
+    'labaride_socketio_rooms', 'Joined Socket.IO rooms in this worker by kind', _socket_room_counts, ('kind',))
+
+add_acquire_observer(db_acquire_latency.observe)
+add_emit_observer(lambda event, room: socket_emits.inc(event))
+
+def _observe_password_hash(hash_seconds, wait_seconds):
+    password_hash_latency.observe(hash_seconds)
+    password_hash_wait.observe(wait_seconds)
+
+password_hasher.add_observer(_observe_password_hash)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_latency.observe(time.perf_counter() - started, request.method, route)
+        http_responses.inc(request.method, route, str(response.status_code))
+    return response
+
 # Initialize controllers
 user_controller = UserController()
 transaction_controller = TransactionController()
+idempotency_controller = IdempotencyController()
+
+# Read-through cache for the shop catalog endpoints. Keys are per endpoint
+# and per shop; every write route invalidates exactly what it touched.
+# Other workers hear about writes over best-effort datagrams, so the TTL is
+# what bounds staleness when one is lost: keep it short, like the kilo
+# price tiers.
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '30'))
+
+catalog_cache = TTLCache(
+    maxsize=int(os.getenv('CATALOG_CACHE_SIZE', '2048')),
+    ttl=CATALOG_CACHE_TTL
+)
+
+def invalidate_catalog(*keys):
+    catalog_cache.invalidate(*keys)
+    invalidation_bus.publish('catalog', keys)
+
+def clear_catalog():
+    catalog_cache.clear()
+    invalidation_bus.publish('catalog')
+
+def _apply_remote_invalidation(keys):
+    # Writes handled by other gunicorn workers
+    if keys is None:
+        catalog_cache.clear()
+    else:
+        catalog_cache.invalidate(*keys)
+
+invalidation_bus.subscribe('catalog', _apply_remote_invalidation)
+
+# Digest of each cached catalog payload, for ETags. Computed once per
+# loaded value: a reload gives a new object and so a new digest.
+catalog_digests = TTLCache(
+    maxsize=int(os.getenv('CATALOG_CACHE_SIZE', '2048')),
+    ttl=CATALOG_CACHE_TTL
+)
+
+def catalog_version(key, loader):
+    rows = catalog_cache.get_or_load(key, loader)
+    entry = catalog_digests.get(key)
+    if entry is None or entry[0] is not rows:
+        entry = (rows, payload_digest(rows))
+        catalog_digests.set(key, entry)
+    return entry[1], None
+
+# Listen for other workers' invalidations from the start rather than from
+# the first request. Workers forked from a preloaded app start their own
+# in gunicorn's post_worker_init; the hook below is the fallback for any
+# other forking server and a no-op once the bus runs in this process.
+invalidation_bus.ensure_started()
+
+@app.before_request
+def start_invalidation_bus():
+    invalidation_bus.ensure_started()
 
 # Socket event handlers
 @socketio.on('connect')
@@ -29,20 +188,43 @@ def handle_connect():
 def handle_disconnect():
     print('Client disconnected')
 
+def _join_with_replay(room, data):
+    # Clients that can take batched "events" payloads say so with
+    # {"batch": true} and join the room's batch variant instead
+    batch = bool(data.get('batch'))
+    # Join first so nothing emitted during the replay is lost; clients
+    # drop duplicates by seq
+    join_room(room + BATCH_SUFFIX if batch else room)
+    position = room_event_log.position(room)
+    emit('room_joined', {'room': room, 'batch': batch, **position})
+
+    last_seq = data.get('last_seq')
+    if last_seq is None:
+        return
+    missed = None
+    if isinstance(last_seq, int):
+        missed = room_event_log.since(room, data.get('epoch'), last_seq)
+    if missed is None:
+        emit('resync_required', {'room': room, **position})
+    elif batch:
+        if missed:
+            emit('events', {'room': room, 'events': [{'event': event, 'data': payload} for event, payload in missed]})
+    else:
+        for event, payload in missed:
+            emit(event, payload)
+
 @socketio.on('join_shop_room')
 def handle_join_shop(data):
     shop_id = data.get('shop_id')
     if shop_id:
-        join_room(f"shop_{shop_id}")
-        emit('room_joined', {'room': f"shop_{shop_id}"})
+        _join_with_replay(f"shop_{shop_id}", data)
         print(f"Shop {shop_id} joined room")
 
 @socketio.on('join_user_room')
 def handle_join_user(data):
     user_id = data.get('user_id')
     if user_id:
-        join_room(f"user_{user_id}")
-        emit('room_joined', {'room': f"user_{user_id}"})
+        _join_with_replay(f"user_{user_id}", data)
         print(f"User {user_id} joined room")
 
 # JWT decorator for protected routes
@@ -62,27 +244,106 @@ def jwt_required(f):
             if scheme.lower() != 'bearer':
                 return jsonify({'message': 'Invalid authentication scheme'}), 401
 
-            # Debug prints
-            print(f"Debug - Token being decoded: {token}")
-            print(f"Debug - Secret key being used: {app.config['SECRET_KEY']}")
-            
-            data = jwt.decode(
-                token, 
-                app.config['SECRET_KEY'],
-                algorithms=["HS256"]
-            )
-            
-            print(f"Debug - Decoded token data: {data}")
+            # Verified tokens are cached until their exp
+            data = token_cache.decode(token, app.config['SECRET_KEY'])
             
             request.user = data
             return f(*args, **kwargs)
             
         except jwt.InvalidTokenError as e:
-            print(f"Debug - Token error: {str(e)}")
+            auth_logger.info('token rejected path=%s reason=%s', request.path, e)
             return jsonify({'message': f'Token is invalid: {str(e)}'}), 401
             
     return decorated
 
+# /metrics and /api/debug/* expose SQL text, room ids and order internals.
+# They answer in debug mode, or to "Authorization: Bearer <token>" when
+# INTERNAL_API_TOKEN is set (what a Prometheus scrape job sends with its
+# authorization block); anyone else gets a 404.
+app.config.setdefault('INTERNAL_API_TOKEN', os.getenv('INTERNAL_API_TOKEN'))
+
+def internal_only(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not app.debug:
+            expected = app.config['INTERNAL_API_TOKEN']
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            if (not expected or scheme.lower() != 'bearer'
+                    or not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8'))):
+                return jsonify({'message': 'Not found'}), 404
+        return f(*args, **kwargs)
+    return decorated
+
+def _complete_idempotency_key(user_id, key, response):
+    # The order is committed by now, so the client gets the real response
+    # whatever happens here. A key left 'processing' still answers retries
+    # with 409 until the lease runs out, so one more try narrows the window
+    # in which a retry could take the key over and order twice.
+    body = response.get_data(as_text=True)
+    for attempt in (1, 2):
+        try:
+            idempotency_controller.complete(user_id, key, response.status_code, body)
+            return
+        except Exception:
+            idempotency_logger.exception(
+                "Could not complete Idempotency-Key %r for user %s (attempt %s)", key, user_id, attempt
+            )
+
+def _release_idempotency_key(user_id, key):
+    try:
+        idempotency_controller.abandon(user_id, key)
+    except Exception:
+        idempotency_logger.exception("Could not release Idempotency-Key %r for user %s", key, user_id)
+
+# Idempotency-Key support for write routes; must sit below jwt_required
+def idempotent(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'status': 400, 'message': 'Idempotency-Key is too long'}), 400
+
+        user_id = request.user.get('user_id') or kwargs.get('user_id')
+        request_hash = hashlib.sha256(
+            request.path.encode('utf-8') + b'\n' + request.get_data()
+        ).hexdigest()
+
+        try:
+            claim = idempotency_controller.begin(user_id, key, request_hash)
+        except Exception as e:
+            print(f"Error checking idempotency key: {e}")
+            return jsonify({'status': 500, 'message': str(e)}), 500
+
+        if claim['state'] == 'replay':
+            # Original response, without touching transactions or emitting
+            response = app.response_class(
+                claim['body'], status=claim['status'], mimetype='application/json'
+            )
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if claim['state'] == 'in_progress':
+            response = jsonify({'status': 409, 'message': 'A request with this Idempotency-Key is still in progress'})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        if claim['state'] == 'mismatch':
+            return jsonify({'status': 422, 'message': 'Idempotency-Key was already used for a different request'}), 422
+
+        try:
+            response = app.make_response(f(*args, **kwargs))
+        except Exception:
+            _release_idempotency_key(user_id, key)
+            raise
+
+        if response.status_code >= 500:
+            _release_idempotency_key(user_id, key)
+        else:
+            _complete_idempotency_key(user_id, key, response)
+        return response
+            
+    return decorated
+
 @app.route('/verify_token', methods=['POST'])
 def verify_token():
     token = request.headers.get('Authorization')
@@ -94,7 +355,7 @@ def verify_token():
         if scheme.lower() != 'bearer':
             return jsonify({'valid': False, 'message': 'Invalid token format'}), 401
             
-        decoded = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+        decoded = token_cache.decode(token, app.config['SECRET_KEY'])
         return jsonify({
             'valid': True,
             'user_id': decoded.get('user_id'),
@@ -134,6 +395,8 @@ def get_user(user_id):
 def update_user_details(user_id):
     try:
         result = user_controller.update_profile(user_id, request.json)
+        if result['status'] == 200:
+            invalidate_catalog(('shops',))
         return jsonify(result), result['status']
     except Exception as e:
         return jsonify({'status': 500, 'message': str(e)}), 500
@@ -142,6 +405,8 @@ def update_user_details(user_id):
 @jwt_required
 def delete_account(user_id):
     result = user_controller.delete_account(user_id)
+    if result['status'] == 200:
+        clear_catalog()
     return jsonify(result), result['status']
 
 @app.route('/get_user_by_id/<int:user_id>', methods=['GET'])
@@ -197,7 +462,8 @@ def update_password(user_id):
             
             # Create new hashed password using same salt format
             from werkzeug.security import generate_password_hash
-            new_password = generate_password_hash(
+            new_password = password_hasher.run(
+                generate_password_hash,
                 data['new_password'],
                 method='pbkdf2:sha256',
                 salt_length=16
@@ -218,6 +484,8 @@ def update_password(user_id):
         else:
             return jsonify({'message': 'Invalid password format'}), 400
         
+    except HasherBusy:
+        return jsonify({'message': 'Server busy, please try again'}), 503
     except Exception as e:
         if connection:
             connection.rollback()
@@ -281,6 +549,7 @@ def register_shop(user_id):
         )
         
         connection.commit()
+        invalidate_catalog(('shops',), ('shops_recent',), ('shop', shop_id))
         return jsonify({
             'status': 201,
             'message': 'Shop registered successfully',
@@ -296,36 +565,30 @@ def register_shop(user_id):
             cursor.close()
             connection.close()
 
+def _load_shops():
+    return fetch_all("""
+        SELECT s.*, u.name as owner_name, u.email as owner_email,
+               GROUP_CONCAT(
+                   JSON_OBJECT(
+                       'name', ss.service_name,
+                       'price', ss.price
+                   )
+               ) as services
+        FROM shops s
+        JOIN users u ON s.user_id = u.id
+        LEFT JOIN shop_services ss ON s.id = ss.shop_id
+        GROUP BY s.id
+    """)
+
 @app.route('/shops', methods=['GET'])
+@conditional(lambda: catalog_version(('shops',), _load_shops))
 def get_shops():
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        query = """
-            SELECT s.*, u.name as owner_name, u.email as owner_email,
-                   GROUP_CONCAT(
-                       JSON_OBJECT(
-                           'name', ss.service_name,
-                           'price', ss.price
-                       )
-                   ) as services
-            FROM shops s
-            JOIN users u ON s.user_id = u.id
-            LEFT JOIN shop_services ss ON s.id = ss.shop_id
-            GROUP BY s.id
-        """
-        cursor.execute(query)
-        shops = cursor.fetchall()
+        shops = catalog_cache.get_or_load(('shops',), _load_shops)
         
         return jsonify({"shops": shops}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 @app.route('/shop/user/<int:user_id>', methods=['GET'])
 @jwt_required
@@ -358,64 +621,40 @@ def get_user_shop(user_id):
 
 @app.route('/shops/recent', methods=['GET'])
 def get_recent_shops():
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Query to fetch the most recent shops
-        query = """
+        shops = catalog_cache.get_or_load(('shops_recent',), lambda: fetch_all("""
             SELECT id, shop_name, contact_number, zone, street, barangay, building, 
                 opening_time, closing_time, created_at
             FROM shops
             ORDER BY created_at DESC
             LIMIT 10
-        """
-        cursor.execute(query)
-        shops = cursor.fetchall()
+        """))
         
         return jsonify(shops), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()   
             
 @app.route('/shop/<int:shop_id>', methods=['GET'])
 @jwt_required
 def get_shop_by_id(shop_id):
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get shop details
-        cursor.execute("""
+        # Get shop details; a missing shop is cached too
+        shop = catalog_cache.get_or_load(('shop', shop_id), lambda: fetch_one("""
             SELECT id, shop_name, contact_number, zone, street, barangay, 
                    building, opening_time, closing_time, created_at 
             FROM shops
             WHERE id = %s
-        """, (shop_id,))
-        
-        shop = cursor.fetchone()
+        """, (shop_id,)))
         
         if not shop:
             return jsonify({'error': 'Shop not found'}), 404
 
-        # Format datetime for JSON
-        if shop and 'created_at' in shop:
-            shop['created_at'] = shop['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            
         return jsonify(shop)
         
     except Exception as e:
         print(f"Error fetching shop {shop_id}: {str(e)}")  # Debug log
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 @app.route('/update_shop/<int:shop_id>', methods=['PUT'])
 @jwt_required
@@ -447,6 +686,7 @@ def update_shop(shop_id):
         connection.commit()
         
         if cursor.rowcount > 0:
+            invalidate_catalog(('shops',), ('shops_recent',), ('shop', shop_id))
             return jsonify({
                 'message': 'Shop updated successfully',
                 'shop_id': shop_id
@@ -465,41 +705,117 @@ def update_shop(shop_id):
             connection.close()
             
 # Transaction Routes
+def _prepare_order(data):
+    data = data.copy()
+    # Convert list of services to comma-separated string
+    services = data.get('services', [])
+    data['service_name'] = ', '.join(services)
+    return data
+
+def _emit_new_transaction(transaction_id, user_id, data):
+    shop_id = data['shop_id']
+    transaction_data = {
+        'transaction_id': transaction_id,
+        'user_id': user_id,
+        'shop_id': shop_id,
+        'service_name': data.get('service_name'),
+        'items': data.get('items', []),
+        'status': 'Pending',
+        'total_amount': data['total_amount'],
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    
+    # Emit to both shop and user rooms
+    socketio.emit('new_transaction', transaction_data, room=f"shop_{shop_id}")
+    socketio.emit('transaction_update', transaction_data, room=f"user_{user_id}")
+
 @app.route('/create_transaction/<int:user_id>', methods=['POST'])
 @jwt_required
+@idempotent
 def create_transaction(user_id):
     try:
-        data = request.json.copy()
-        # Convert list of services to comma-separated string
-        services = data.get('services', [])
-        data['service_name'] = ', '.join(services)
+        data = _prepare_order(request.json)
         result = transaction_controller.create_transaction(user_id, data)
         if result['status'] == 201:
-            shop_id = data['shop_id']
-            transaction_data = {
-                'transaction_id': result['transaction_id'],
-                'user_id': user_id,
-                'shop_id': shop_id,
-                'service_name': data.get('service_name'),
-                'items': data.get('items', []),
-                'status': 'Pending',
-                'total_amount': data['total_amount'],
-                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            # Emit to both shop and user rooms
-            socketio.emit('new_transaction', transaction_data, room=f"shop_{shop_id}")
-            socketio.emit('transaction_update', transaction_data, room=f"user_{user_id}")
+            _emit_new_transaction(result['transaction_id'], user_id, data)
             
         return jsonify(result), result['status']
     except Exception as e:
         print(f"Error in create_transaction: {str(e)}")
         return jsonify({'status': 500, 'message': str(e)}), 500
 
+@app.route('/create_transactions', methods=['POST'])
+@jwt_required
+@idempotent
+def create_transactions():
+    try:
+        body = request.json or {}
+        user_id = body.get('user_id', request.user.get('user_id'))
+        if not user_id:
+            return jsonify({'status': 400, 'message': 'user_id is required'}), 400
+
+        orders = body.get('transactions')
+        error = transaction_controller.validate_orders(orders)
+        if error:
+            return jsonify(error), error['status']
+        orders = [_prepare_order(order) for order in orders]
+        result = transaction_controller.create_transactions(user_id, orders)
+        if result['status'] == 201:
+            for transaction_id, data in zip(result['transaction_ids'], orders):
+                _emit_new_transaction(transaction_id, user_id, data)
+
+        return jsonify(result), result['status']
+    except Exception as e:
+        transaction_logger.exception("Error in create_transactions")
+        return jsonify({'status': 500, 'message': str(e)}), 500
+
+# Keyset pagination on (created_at, id), served by the
+# transactions(user_id|shop_id, created_at, id) indexes
+KEYSET_CONDITION = " AND (t.created_at < %s OR (t.created_at = %s AND t.id < %s))"
+
+# Columns the transaction list endpoints can project with ?fields=
+TRANSACTION_COLUMNS = {
+    name: f"t.{name}" for name in (
+        'id', 'user_id', 'shop_id', 'user_name', 'user_email', 'user_phone',
+        'service_name', 'services', 'kilo_amount', 'price_per_kilo', 'subtotal',
+        'delivery_fee', 'voucher_discount', 'total_amount', 'delivery_type',
+        'zone', 'street', 'barangay', 'building', 'scheduled_date',
+        'scheduled_time', 'payment_method', 'notes', 'status', 'created_at',
+        'updated_at'
+    )
+}
+
+SHOP_TRANSACTION_FIELDS = FieldSet(
+    dict(TRANSACTION_COLUMNS, customer_name='u.name', customer_email='u.email'),
+    profiles={
+        'summary': ('id', 'status', 'total_amount', 'created_at', 'customer_name'),
+        'detail': tuple(TRANSACTION_COLUMNS) + ('customer_name', 'customer_email'),
+    },
+    # Needed for the keyset cursor
+    required=('id', 'created_at')
+)
+
+ORDER_FIELDS = FieldSet(
+    TRANSACTION_COLUMNS,
+    profiles={
+        'summary': ('id', 'status', 'total_amount', 'created_at', 'user_name'),
+        'detail': tuple(TRANSACTION_COLUMNS),
+    }
+)
+
+def _page_args():
+    limit = parse_limit(request.args.get('limit'))
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor) if cursor else None
+
 @app.route('/user_transactions/<int:user_id>', methods=['GET'])
 @jwt_required
 def get_user_transactions(user_id):
     connection = None
+    try:
+        limit, after = _page_args()
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     try:
         connection = create_connection()
         cursor = connection.cursor(dictionary=True)
@@ -530,30 +846,22 @@ def get_user_transactions(user_id):
                 t.notes
             FROM transactions t
             JOIN shops s ON t.shop_id = s.id
-            WHERE t.user_id = %s
-            ORDER BY t.created_at DESC
-        """
-        cursor.execute(query, (user_id,))
-        transactions = cursor.fetchall()
-        
-        # Format dates, times, and decimals
-        formatted_transactions = []
-        for transaction in transactions:
-            formatted_transaction = {}
-            for key, value in transaction.items():
-                if isinstance(value, datetime):
-                    formatted_transaction[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                elif isinstance(value, timedelta):
-                    formatted_transaction[key] = str(value)
-                elif isinstance(value, Decimal):
-                    formatted_transaction[key] = float(value)
-                else:
-                    formatted_transaction[key] = value
-            formatted_transactions.append(formatted_transaction)
+            WHERE t.user_id = %s{}
+            ORDER BY t.created_at DESC, t.id DESC
+            LIMIT %s
+        """.format(KEYSET_CONDITION if after else "")
+        params = [user_id]
+        if after:
+            params.extend([after[0], after[0], after[1]])
+        params.append(limit + 1)
+        cursor.execute(query, tuple(params))
+        transactions, next_cursor = keyset_page(cursor.fetchall(), limit)
             
+        # Dates, times and decimals are handled by the JSON encoder
         return jsonify({
             'status': 'success',
-            'data': formatted_transactions
+            'data': transactions,
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -573,40 +881,43 @@ from datetime import datetime, timedelta
 @jwt_required
 def get_shop_transactions(shop_id):
     connection = None
+    try:
+        limit, after = _page_args()
+        fields = SHOP_TRANSACTION_FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
         connection = create_connection()
         cursor = connection.cursor(dictionary=True)
         
+        if fields is None:
+            select_list = "t.*, u.name as customer_name, u.email as customer_email"
+            join_users = True
+        else:
+            select_list = SHOP_TRANSACTION_FIELDS.select_list(fields)
+            join_users = SHOP_TRANSACTION_FIELDS.uses(fields, 'u.')
         query = """
-            SELECT t.*, u.name as customer_name, u.email as customer_email
-            FROM transactions t
-            JOIN users u ON t.user_id = u.id
-            WHERE t.shop_id = %s
-            ORDER BY t.created_at DESC
-        """
-        cursor.execute(query, (shop_id,))
-        transactions = cursor.fetchall()
-        
-        # Convert datetime, timedelta, and Decimal objects to JSON serializable format
-        formatted_transactions = []
-        for transaction in transactions:
-            formatted_transaction = {}
-            for key, value in transaction.items():
-                if isinstance(value, datetime):
-                    formatted_transaction[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                elif isinstance(value, timedelta):
-                    total_seconds = int(value.total_seconds())
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    seconds = total_seconds % 60
-                    formatted_transaction[key] = f"{hours:02}:{minutes:02}:{seconds:02}"
-                elif isinstance(value, Decimal):
-                    formatted_transaction[key] = float(value)
-                else:
-                    formatted_transaction[key] = value
-            formatted_transactions.append(formatted_transaction)
-
-        return jsonify({"transactions": formatted_transactions}), 200
+            SELECT {}
+            FROM transactions t{}
+            WHERE t.shop_id = %s{}
+            ORDER BY t.created_at DESC, t.id DESC
+            LIMIT %s
+        """.format(
+            select_list,
+            " JOIN users u ON t.user_id = u.id" if join_users else "",
+            KEYSET_CONDITION if after else ""
+        )
+        params = [shop_id]
+        if after:
+            params.extend([after[0], after[0], after[1]])
+        params.append(limit + 1)
+        cursor.execute(query, tuple(params))
+        transactions, next_cursor = keyset_page(cursor.fetchall(), limit)
+
+        return jsonify({
+            "transactions": transactions,
+            "next_cursor": next_cursor
+        }), 200
         
     except Exception as e:
         print(f"Error fetching transactions: {e}")
@@ -616,6 +927,184 @@ def get_shop_transactions(shop_id):
             cursor.close()
             connection.close()
 
+# Exports read EXPORT_CHUNK_SIZE rows per query and hand the connection
+# back to the pool between chunks, so memory stays flat and a slow client
+# never pins a connection. EXPORT_MAX_SECONDS bounds the whole download.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))
+EXPORT_MAX_SECONDS = float(os.getenv('EXPORT_MAX_SECONDS', '300'))
+EXPORT_QUERY_TIMEOUT_MS = int(os.getenv('EXPORT_QUERY_TIMEOUT_MS', '10000'))
+
+export_logger = logging.getLogger('labaride.export')
+
+class ExportFailed(Exception):
+    # A chunk query failed mid-download; args[0] is the resume cursor
+    pass
+
+def _export_rows(shop_id, fields, start, end, after=None):
+    query = """
+        SELECT /*+ MAX_EXECUTION_TIME({}) */ {}
+        FROM transactions t{}
+        WHERE t.shop_id = %s AND t.created_at >= %s AND t.created_at < %s{}
+        ORDER BY t.created_at, t.id
+        LIMIT %s
+    """.format(
+        EXPORT_QUERY_TIMEOUT_MS,
+        SHOP_TRANSACTION_FIELDS.select_list(fields),
+        " JOIN users u ON t.user_id = u.id" if SHOP_TRANSACTION_FIELDS.uses(fields, 'u.') else "",
+        "{}"
+    )
+    first = query.format("")
+    rest = query.format(" AND (t.created_at > %s OR (t.created_at = %s AND t.id > %s))")
+    deadline = time.monotonic() + EXPORT_MAX_SECONDS
+    while True:
+        if time.monotonic() > deadline:
+            raise TimeoutError(encode_cursor(*after) if after else None)
+        try:
+            if after is None:
+                rows = fetch_all(first, (shop_id, start, end, EXPORT_CHUNK_SIZE))
+            else:
+                rows = fetch_all(rest, (shop_id, start, end, after[0], after[0], after[1], EXPORT_CHUNK_SIZE))
+        except Exception as e:
+            # Headers and earlier chunks are already sent, so the status
+            # can no longer change; the caller ends the body with a marker
+            export_logger.exception("Export of shop %s failed after %s", shop_id, after)
+            raise ExportFailed(encode_cursor(*after) if after else None) from e
+        if not rows:
+            return
+        yield rows
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            return
+        after = (rows[-1]['created_at'], rows[-1]['id'])
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (str, int, float)):
+        return value
+    return encode_value(value)
+
+def _export_ndjson(chunks):
+    try:
+        for rows in chunks:
+            yield b''.join(dumps_line(row) for row in rows)
+    except TimeoutError as e:
+        # Last line tells the client where to resume with ?after=
+        yield dumps_line({'truncated': True, 'after': e.args[0]})
+    except ExportFailed as e:
+        yield dumps_line({'truncated': True, 'error': 'export failed', 'after': e.args[0]})
+
+def _export_csv(chunks, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    try:
+        for rows in chunks:
+            for row in rows:
+                writer.writerow([_csv_value(row[name]) for name in fields])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    except TimeoutError:
+        export_logger.warning("CSV export hit the %ss limit and was cut short", EXPORT_MAX_SECONDS)
+        # Trailing marker row so a partial file is never mistaken for a whole one
+        writer.writerow(['#TRUNCATED', f'export hit the {EXPORT_MAX_SECONDS:g}s limit'])
+        yield buffer.getvalue()
+    except ExportFailed:
+        writer.writerow(['#ERROR', 'export failed, data is incomplete'])
+        yield buffer.getvalue()
+
+@app.route('/shop/<int:shop_id>/transactions/export', methods=['GET'])
+@jwt_required
+def export_shop_transactions(shop_id):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    try:
+        fields = SHOP_TRANSACTION_FIELDS.parse(request.args.get('fields', 'detail'))
+        start = datetime.strptime(request.args.get('from', '1970-01-01'), '%Y-%m-%d')
+        to = datetime.strptime(request.args.get('to', '9999-12-30'), '%Y-%m-%d')
+        # "to" is inclusive; the last representable day has no next day
+        end = to + timedelta(days=1) if to.date() < datetime.max.date() else datetime.max
+        # Resume point from a truncated NDJSON export
+        after = decode_cursor(request.args['after']) if request.args.get('after') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    chunks = _export_rows(shop_id, fields, start, end, after)
+    filename = f"transactions-shop{shop_id}-{start:%Y%m%d}-{to:%Y%m%d}.{export_format}"
+    if export_format == 'csv':
+        body, mimetype = _export_csv(chunks, fields), 'text/csv'
+    else:
+        body, mimetype = _export_ndjson(chunks), 'application/x-ndjson'
+    response = app.response_class(body, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# Rows changed within this many seconds are held back from /sync so a
+# write that commits late with an older updated_at cannot end up behind a
+# watermark a client already has. Keep it above the longest write
+# transaction on transactions.
+SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', '2'))
+
+@app.route('/sync/transactions', methods=['GET'])
+@jwt_required
+def sync_transactions():
+    user_id = request.args.get('user_id', type=int)
+    shop_id = request.args.get('shop_id', type=int)
+    if (user_id is None) == (shop_id is None):
+        return jsonify({'status': 'error', 'message': 'Pass exactly one of user_id or shop_id'}), 400
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        since = request.args.get('since')
+        after = decode_cursor(since) if since else None
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    connection = None
+    try:
+        connection = create_connection()
+        cursor = connection.cursor(dictionary=True)
+
+        query = """
+            SELECT t.*, s.shop_name, u.name as customer_name, u.email as customer_email
+            FROM transactions t
+            JOIN shops s ON t.shop_id = s.id
+            JOIN users u ON t.user_id = u.id
+            WHERE {} = %s{}
+              AND t.updated_at <= NOW(3) - INTERVAL %s MICROSECOND
+            ORDER BY t.updated_at, t.id
+            LIMIT %s
+        """.format(
+            't.user_id' if user_id is not None else 't.shop_id',
+            " AND (t.updated_at > %s OR (t.updated_at = %s AND t.id > %s))" if after else ""
+        )
+        params = [user_id if user_id is not None else shop_id]
+        if after:
+            params.extend([after[0], after[0], after[1]])
+        params.extend([int(SYNC_SETTLE_SECONDS * 1000000), limit + 1])
+        cursor.execute(query, tuple(params))
+        rows = cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        # No changes keeps the client's watermark as it was
+        watermark = encode_cursor(rows[-1]['updated_at'], rows[-1]['id']) if rows else since
+
+        return jsonify({
+            'status': 'success',
+            'data': rows,
+            'watermark': watermark,
+            'has_more': has_more
+        }), 200
+
+    except Exception as e:
+        print(f"Error syncing transactions: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        if connection and connection.is_connected():
+            cursor.close()
+            connection.close()
+
 @app.route('/update_transaction_status/<string:transaction_id>', methods=['PUT'])
 @jwt_required
 def update_transaction_status(transaction_id):
@@ -679,29 +1168,24 @@ def check_user_shop(user_id):
             connection.close()
 
 #Service Routes
+def _load_shop_services(shop_id):
+    return fetch_all("""
+        SELECT id, service_name, color, CAST(price AS FLOAT) as price 
+        FROM shop_services 
+        WHERE shop_id = %s
+    """, (shop_id,))
+
 @app.route('/shop/<int:shop_id>/services', methods=['GET'])
 @jwt_required
+@conditional(lambda shop_id: catalog_version(('shop_services', shop_id), lambda: _load_shop_services(shop_id)))
 def get_shop_services(shop_id):
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT id, service_name, color, CAST(price AS FLOAT) as price 
-            FROM shop_services 
-            WHERE shop_id = %s
-        """, (shop_id,))
+        services = catalog_cache.get_or_load(('shop_services', shop_id), lambda: _load_shop_services(shop_id))
         
-        services = cursor.fetchall()
         return jsonify({'services': services}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 @app.route('/shop/<int:shop_id>/service', methods=['POST'])
 @jwt_required
@@ -728,6 +1212,7 @@ def add_shop_service(shop_id):
         ))
         
         connection.commit()
+        invalidate_catalog(('shops',), ('shop_services', shop_id), ('all_services',))
         return jsonify({'message': 'Service added successfully'}), 201
         
     except Exception as e:
@@ -746,6 +1231,10 @@ def manage_shop_service(service_id):
     try:
         connection = create_connection()
         cursor = connection.cursor()
+
+        # Owning shop, so only its cached catalog entries are dropped
+        cursor.execute("SELECT shop_id FROM shop_services WHERE id = %s", (service_id,))
+        service = cursor.fetchone()
         
         if request.method == 'DELETE':
             cursor.execute("DELETE FROM shop_services WHERE id = %s", (service_id,))
@@ -760,6 +1249,8 @@ def manage_shop_service(service_id):
             message = 'Service updated successfully'
             
         connection.commit()
+        if service:
+            invalidate_catalog(('shops',), ('shop_services', service[0]), ('all_services',))
         return jsonify({'message': message}), 200
         
     except Exception as e:
@@ -777,24 +1268,23 @@ def manage_shop_service(service_id):
 def manage_household_items(shop_id):
     connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         if request.method == 'GET':
-            cursor.execute("""
+            items = catalog_cache.get_or_load(('shop_household', shop_id), lambda: fetch_all("""
                 SELECT * FROM household_items 
                 WHERE shop_id = %s
-            """, (shop_id,))
-            items = cursor.fetchall()
+            """, (shop_id,)))
             return jsonify({'items': items}), 200
             
         else:  # POST
             data = request.json
+            connection = create_connection()
+            cursor = connection.cursor(dictionary=True)
             cursor.execute("""
                 INSERT INTO household_items (shop_id, item_name, price)
                 VALUES (%s, %s, %s)
             """, (shop_id, data['name'], data['price']))
             connection.commit()
+            invalidate_catalog(('shop_household', shop_id), ('all_items',))
             return jsonify({'message': 'Item added successfully'}), 201
             
     except Exception as e:
@@ -811,24 +1301,23 @@ def manage_household_items(shop_id):
 def manage_clothing_types(shop_id):
     connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         if request.method == 'GET':
-            cursor.execute("""
+            types = catalog_cache.get_or_load(('shop_clothing', shop_id), lambda: fetch_all("""
                 SELECT * FROM clothing_types 
                 WHERE shop_id = %s
-            """, (shop_id,))
-            types = cursor.fetchall()
+            """, (shop_id,)))
             return jsonify({'types': types}), 200
             
         else:  # POST
             data = request.json
+            connection = create_connection()
+            cursor = connection.cursor(dictionary=True)
             cursor.execute("""
                 INSERT INTO clothing_types (shop_id, type_name, price)
                 VALUES (%s, %s, %s)
             """, (shop_id, data['name'], data['price']))
             connection.commit()
+            invalidate_catalog(('shop_clothing', shop_id))
             return jsonify({'message': 'Clothing type added successfully'}), 201
             
     except Exception as e:
@@ -843,48 +1332,30 @@ def manage_clothing_types(shop_id):
 @app.route('/shop/<int:shop_id>/clothing', methods=['GET'])
 @jwt_required
 def get_clothing_types(shop_id):
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("""
+        types = catalog_cache.get_or_load(('shop_clothing', shop_id), lambda: fetch_all("""
             SELECT * FROM clothing_types 
             WHERE shop_id = %s
-        """, (shop_id,))
+        """, (shop_id,)))
         
-        types = cursor.fetchall()
         return jsonify({'types': types}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 @app.route('/shop/<int:shop_id>/household', methods=['GET'])
 @jwt_required
 def get_household_items(shop_id):
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("""
+        items = catalog_cache.get_or_load(('shop_household', shop_id), lambda: fetch_all("""
             SELECT * FROM household_items 
             WHERE shop_id = %s
-        """, (shop_id,))
+        """, (shop_id,)))
         
-        items = cursor.fetchall()
         return jsonify({'items': items}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 @app.route('/shop/<int:shop_id>/household', methods=['POST'])
 @jwt_required
@@ -916,6 +1387,7 @@ def add_household_item(shop_id):
         """, (shop_id, data['name'], data['price']))
         
         connection.commit()
+        invalidate_catalog(('shop_household', shop_id), ('all_items',))
         return jsonify({'message': 'Item added successfully'}), 201
         
     except Exception as e:
@@ -957,6 +1429,7 @@ def add_clothing_type(shop_id):
         """, (shop_id, data['name'], data['price']))
         
         connection.commit()
+        invalidate_catalog(('shop_clothing', shop_id))
         return jsonify({'message': 'Type added successfully'}), 201
         
     except Exception as e:
@@ -976,6 +1449,9 @@ def update_household_item(item_id):
         data = request.json
         connection = create_connection()
         cursor = connection.cursor()
+
+        cursor.execute("SELECT shop_id FROM household_items WHERE id = %s", (item_id,))
+        item = cursor.fetchone()
         
         cursor.execute("""
             UPDATE household_items 
@@ -984,6 +1460,8 @@ def update_household_item(item_id):
         """, (data['price'], item_id))
         
         connection.commit()
+        if item:
+            invalidate_catalog(('shop_household', item[0]), ('all_items',))
         return jsonify({'message': 'Item updated successfully'}), 200
         
     except Exception as e:
@@ -1003,6 +1481,9 @@ def update_clothing_type(type_id):
         data = request.json
         connection = create_connection()
         cursor = connection.cursor()
+
+        cursor.execute("SELECT shop_id FROM clothing_types WHERE id = %s", (type_id,))
+        clothing_type = cursor.fetchone()
         
         cursor.execute("""
             UPDATE clothing_types 
@@ -1011,6 +1492,8 @@ def update_clothing_type(type_id):
         """, (data['price'], type_id))
         
         connection.commit()
+        if clothing_type:
+            invalidate_catalog(('shop_clothing', clothing_type[0]))
         return jsonify({'message': 'Type updated successfully'}), 200
         
     except Exception as e:
@@ -1026,99 +1509,108 @@ def update_clothing_type(type_id):
 @app.route('/shop/services', methods=['GET'])
 @jwt_required
 def get_all_shop_services():
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get all active services with their prices and colors
-        cursor.execute("""
-            SELECT s.id, s.service_name, s.price, s.color, s.description
-            FROM shop_services s
-            WHERE s.is_active = true
-            ORDER BY s.service_name
-        """)
-        
-        services = cursor.fetchall()
-        
-        # Convert Decimal to float for JSON serialization
-        for service in services:
-            service['price'] = float(service['price'])
-        
+        services = catalog_cache.get_or_load(('all_services',), _load_all_shop_services)
         return jsonify({'services': services}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+
+def _load_all_shop_services():
+    # Get all active services with their prices and colors
+    services = fetch_all("""
+        SELECT s.id, s.service_name, s.price, s.color, s.description
+        FROM shop_services s
+        WHERE s.is_active = true
+        ORDER BY s.service_name
+    """)
+    
+    # Convert Decimal to float for JSON serialization
+    for service in services:
+        service['price'] = float(service['price'])
+    return services
 
 @app.route('/shop/items', methods=['GET'])
 @jwt_required
 def get_all_shop_items():
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get all household items
-        cursor.execute("""
-            SELECT hi.id, hi.item_name, hi.price
-            FROM household_items hi
-            ORDER BY hi.item_name
-        """)
-        
-        items = cursor.fetchall()
-        
-        # Convert Decimal to float
-        for item in items:
-            item['price'] = float(item['price'])
-        
+        items = catalog_cache.get_or_load(('all_items',), _load_all_shop_items)
         return jsonify({'items': items}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+
+def _load_all_shop_items():
+    # Get all household items
+    items = fetch_all("""
+        SELECT hi.id, hi.item_name, hi.price
+        FROM household_items hi
+        ORDER BY hi.item_name
+    """)
+    
+    # Convert Decimal to float
+    for item in items:
+        item['price'] = float(item['price'])
+    return items
 
 # Kilo Price Routes
-@app.route('/shop/<int:shop_id>/kilo-prices', methods=['GET'])
+def _stats_totals(rows):
+    orders = sum(row['orders'] for row in rows)
+    kilos = sum(row['kilos'] for row in rows)
+    return {
+        'orders': orders,
+        'cancelled': sum(row['cancelled'] for row in rows),
+        'revenue': sum(row['revenue'] for row in rows),
+        'kilos': kilos,
+        'avg_kilo_per_order': round(float(kilos) / orders, 2) if orders else 0.0
+    }
+
+@app.route('/shop/<int:shop_id>/stats', methods=['GET'])
 @jwt_required
-def get_kilo_prices(shop_id):
-    connection = None
+def get_shop_stats(shop_id):
+    # Reads the trigger-maintained rollups: at most 7 day rows and one row
+    # per status, however many orders the shop has
     try:
-        connection = create_connection()
-        cursor = connection.cursor()
-        
-        cursor.execute("""
-            SELECT min_kilo, max_kilo, price_per_kilo 
-            FROM kilo_prices 
+        days = fetch_all("""
+            SELECT day, day = CURDATE() AS is_today, orders, cancelled, revenue, kilos
+            FROM shop_daily_stats
             WHERE shop_id = %s
+              AND day >= CURDATE() - INTERVAL WEEKDAY(CURDATE()) DAY
+              AND day <= CURDATE()
         """, (shop_id,))
-        
-        prices = cursor.fetchall()
-        
-        # Convert Decimal objects to float before JSON serialization
-        formatted_prices = [
-            {
-                'min_kilo': float(price[0]),
-                'max_kilo': float(price[1]),
-                'price_per_kilo': float(price[2])
+        statuses = fetch_all("""
+            SELECT status, orders, revenue, kilos
+            FROM shop_status_stats
+            WHERE shop_id = %s
+        """, (shop_id,))
+
+        counted = [row for row in statuses if row['status'] != 'Cancelled']
+        orders = sum(row['orders'] for row in counted)
+        kilos = sum(row['kilos'] for row in counted)
+        return jsonify({
+            'shop_id': shop_id,
+            'today': _stats_totals([row for row in days if row['is_today']]),
+            'this_week': _stats_totals(days),
+            'by_status': {row['status']: row['orders'] for row in statuses},
+            'all_time': {
+                'orders': orders,
+                'revenue': sum(row['revenue'] for row in counted),
+                'avg_kilo_per_order': round(float(kilos) / orders, 2) if orders else 0.0
             }
-            for price in prices
-        ]
-        
-        return jsonify({'prices': formatted_prices}), 200
+        }), 200
+    except Exception as e:
+        print(f"Error fetching shop stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/shop/<int:shop_id>/kilo-prices', methods=['GET'])
+@jwt_required
+def get_kilo_prices(shop_id):
+    try:
+        # Served from the tier index, which add/delete_kilo_price invalidate
+        return jsonify({'prices': kilo_price_index.tiers(shop_id)}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 @app.route('/shop/<int:shop_id>/kilo-price', methods=['POST'])
 @jwt_required
@@ -1151,6 +1643,7 @@ def add_kilo_price(shop_id):
         """, (shop_id, data['min_kilo'], data['max_kilo'], data['price_per_kilo']))
         
         connection.commit()
+        kilo_price_index.invalidate(shop_id)
         return jsonify({'message': 'Price range added successfully'}), 201
         
     except Exception as e:
@@ -1177,6 +1670,7 @@ def delete_kilo_price(shop_id):
         """, (shop_id, data['min_kilo'], data['max_kilo']))
         
         connection.commit()
+        kilo_price_index.invalidate(shop_id)
         return jsonify({'message': 'Price range deleted successfully'}), 200
         
     except Exception as e:
@@ -1188,8 +1682,23 @@ def delete_kilo_price(shop_id):
             cursor.close()
             connection.close()
             
+def _orders_version():
+    # Whole-shop validator, covered by idx_transactions_shop_updated. COUNT
+    # catches deletes, MAX(updated_at) any insert or change. The status
+    # filter is part of the URL and so of the ETag.
+    shop_id = request.args.get('shop_id')
+    if not shop_id:
+        return None
+    row = fetch_one("""
+        SELECT COUNT(*) AS total, MAX(updated_at) AS changed, MAX(id) AS last_id
+        FROM transactions
+        WHERE shop_id = %s
+    """, (shop_id,))
+    return (row['total'], row['changed'], row['last_id']), row['changed']
+
 @app.route('/api/orders', methods=['GET'])
 @jwt_required
+@conditional(_orders_version)
 def get_orders():
     connection = None
     try:
@@ -1198,30 +1707,27 @@ def get_orders():
 
         if not shop_id:
             return jsonify({'error': 'shop_id is required'}), 400
+        try:
+            fields = ORDER_FIELDS.parse(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         connection = create_connection()
         cursor = connection.cursor(dictionary=True)
 
-        query = "SELECT * FROM transactions WHERE shop_id = %s"
+        select_list = "t.*" if fields is None else ORDER_FIELDS.select_list(fields)
+        query = f"SELECT {select_list} FROM transactions t WHERE t.shop_id = %s"
         params = [shop_id]
 
         if status:
-            query += " AND status = %s"
+            query += " AND t.status = %s"
             params.append(status)
 
-        query += " ORDER BY created_at DESC"
+        query += " ORDER BY t.created_at DESC"
 
         cursor.execute(query, params)
         orders = cursor.fetchall()
 
-        # Always serialize datetime and Decimal fields
-        for order in orders:
-            for key, value in order.items():
-                if isinstance(value, (datetime, timedelta)):
-                    order[key] = str(value)
-                elif isinstance(value, Decimal):
-                    order[key] = float(value)
-
         return jsonify({'orders': orders}), 200
 
     except Exception as e:
@@ -1239,11 +1745,9 @@ def decline_order(order_id):
     try:
         connection = create_connection()
         cursor = connection.cursor()
-        # Update the transaction status to 'cancelled'
-        cursor.execute(
-            "UPDATE transactions SET status = %s WHERE id = %s",
-            ('cancelled', order_id)
-        )
+        result = order_status.transition(cursor, order_id, order_status.CANCELLED)
+        if result['status'] != 200:
+            return jsonify({'error': result['message']}), result['status']
         connection.commit()
         return jsonify({'message': 'Order declined successfully'}), 200
     except Exception as e:
@@ -1268,16 +1772,17 @@ def set_order_price(order_id):
 
         connection = create_connection()
         cursor = connection.cursor(dictionary=True)
-        # Update price in transactions table
-        cursor.execute(
-            "UPDATE transactions SET price_per_kilo = %s, status = %s WHERE id = %s",
-            (price_per_kilo, 'processing', order_id)
+        # Price and status in one statement, which also returns the
+        # customer and shop. The price may be revised while Processing.
+        result = order_status.transition(
+            cursor, order_id, order_status.PROCESSING,
+            allowed_from=(order_status.PENDING, order_status.PROCESSING),
+            assignments={'price_per_kilo': price_per_kilo}
         )
-        # Get user_id and shop_id for this transaction
-        cursor.execute("SELECT user_id, shop_id FROM transactions WHERE id = %s", (order_id,))
-        row = cursor.fetchone()
-        user_id = row['user_id']
-        shop_id = row['shop_id']
+        if result['status'] != 200:
+            return jsonify({'error': result['message']}), result['status']
+        user_id = result['user_id']
+        shop_id = result['shop_id']
         # Get shop name
         cursor.execute("SELECT shop_name FROM shops WHERE id = %s", (shop_id,))
         shop_row = cursor.fetchone()
@@ -1300,8 +1805,20 @@ def set_order_price(order_id):
             cursor.close()
             connection.close()
             
+def _notifications_version(user_id):
+    # notifications has no updated_at; the checksum picks up is_read and
+    # status changes, COUNT/MAX(id) new and deleted rows
+    row = fetch_one("""
+        SELECT COUNT(*) AS total, MAX(id) AS last_id,
+               BIT_XOR(CRC32(CONCAT_WS('|', id, is_read, status))) AS checksum
+        FROM notifications
+        WHERE user_id = %s
+    """, (user_id,))
+    return (row['total'], row['last_id'], row['checksum']), None
+
 @app.route('/api/notifications/<int:user_id>', methods=['GET'])
 @jwt_required
+@conditional(_notifications_version)
 def get_notifications(user_id):
     connection = None
     try:
@@ -1312,10 +1829,6 @@ def get_notifications(user_id):
             (user_id,)
         )
         notifications = cursor.fetchall()
-        # Optionally format datetime
-        for n in notifications:
-            if 'created_at' in n and n['created_at'] is not None:
-                n['created_at'] = n['created_at'].strftime('%Y-%m-%d %H:%M:%S')
         return jsonify({'notifications': notifications}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1335,10 +1848,14 @@ def accept_notification(notification_id):
         cursor.execute("SELECT transaction_id FROM notifications WHERE id = %s", (notification_id,))
         notif = cursor.fetchone()
         if notif and notif['transaction_id']:
-            cursor.execute(
-                "UPDATE transactions SET status = 'processing' WHERE id = %s",
-                (notif['transaction_id'],)
+            # Accepting the quoted price; set_price usually moved the order
+            # to Processing already
+            result = order_status.transition(
+                cursor, notif['transaction_id'], order_status.PROCESSING,
+                allowed_from=(order_status.PENDING, order_status.PROCESSING)
             )
+            if result['status'] == 409:
+                return jsonify({'error': result['message']}), 409
         # Update notification status to accepted
         cursor.execute(
             "UPDATE notifications SET status = 'accepted', is_read = 1 WHERE id = %s",
@@ -1366,10 +1883,9 @@ def decline_notification(notification_id):
         cursor.execute("SELECT transaction_id FROM notifications WHERE id = %s", (notification_id,))
         notif = cursor.fetchone()
         if notif and notif['transaction_id']:
-            cursor.execute(
-                "UPDATE transactions SET status = 'cancelled' WHERE id = %s",
-                (notif['transaction_id'],)
-            )
+            result = order_status.transition(cursor, notif['transaction_id'], order_status.CANCELLED)
+            if result['status'] == 409:
+                return jsonify({'error': result['message']}), 409
         # Update notification status to cancelled
         cursor.execute(
             "UPDATE notifications SET status = 'cancelled', is_read = 1 WHERE id = %s",
@@ -1413,29 +1929,17 @@ def get_service_price(shop_id, service_name):
 @jwt_required
 def get_kilo_price(shop_id):
     kilo = float(request.args.get('kilo', 0))
-    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT min_kilo, max_kilo, price_per_kilo
-            FROM kilo_prices
-            WHERE shop_id = %s AND %s BETWEEN min_kilo AND max_kilo
-            LIMIT 1
-        """, (shop_id, kilo))
-        row = cursor.fetchone()
-        if row:
-            return jsonify(row), 200
+        tier = kilo_price_index.lookup(shop_id, kilo)
+        if tier:
+            return jsonify(dict(tier)), 200
         else:
             return jsonify({'min_kilo': None, 'max_kilo': None, 'price_per_kilo': None}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 @app.route('/api/debug/transaction/<int:order_id>', methods=['GET'])
+@internal_only
 def debug_transaction(order_id):
     connection = None
     try:
@@ -1456,6 +1960,43 @@ def debug_transaction(order_id):
             cursor.close()
             connection.close()
 
+@app.route('/metrics', methods=['GET'])
+@internal_only
+def metrics():
+    return registry.render(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+@app.route('/api/debug/pool', methods=['GET'])
+@internal_only
+def debug_pool():
+    return jsonify(pool_stats()), 200
+
+@app.route('/api/debug/cache', methods=['GET'])
+@internal_only
+def debug_cache():
+    return jsonify({
+        'catalog': catalog_cache.stats(),
+        'kilo_prices': kilo_price_index.stats(),
+        'tokens': token_cache.stats()
+    }), 200
+
+@app.route('/api/debug/realtime', methods=['GET'])
+@internal_only
+def debug_realtime():
+    return jsonify({
+        'event_log': room_event_log.stats(),
+        'emits': emit_scheduler.stats(top=request.args.get('top', 20, type=int))
+    }), 200
+
+@app.route('/api/debug/queries', methods=['GET'])
+@internal_only
+def debug_queries():
+    return jsonify(query_stats.stats(top=request.args.get('top', 20, type=int))), 200
+
+@app.route('/api/debug/hasher', methods=['GET'])
+@internal_only
+def debug_hasher():
+    return jsonify(password_hasher.stats()), 200
+
 @app.route('/api/orders/<int:order_id>/update_total', methods=['PUT'])
 def update_total(order_id):
     connection = None
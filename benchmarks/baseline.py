@@ -0,0 +1,148 @@
+"""Compare bench_load results against a stored baseline.
+
+A run regresses when, for any endpoint in the baseline, throughput drops
+or p50 latency rises by more than --tolerance, or p95/p99 rise by more
+than --tail-tolerance. Latency changes smaller than --min-delta-ms are
+ignored whatever their ratio, so sub-millisecond jitter never fails a
+build. Endpoints that start returning errors also fail.
+
+Baselines only mean something on the machine, dataset and settings they
+were recorded with; comparing runs with different settings is refused.
+
+    python -m benchmarks.bench_load --save-baseline baseline.json
+    python -m benchmarks.bench_load --baseline baseline.json --tolerance 0.1
+    python -m benchmarks.baseline baseline.json results.json
+"""
+import argparse
+import json
+import sys
+
+# (metric, higher is better, tail metric)
+METRICS = (
+    ('throughput_rps', True, False),
+    ('p50_ms', False, False),
+    ('p95_ms', False, True),
+    ('p99_ms', False, True),
+)
+
+# Settings that must match for two runs to be comparable
+COMPARABLE = ('dataset', 'duration_s', 'concurrency', 'tablets', 'machine', 'cpus')
+
+
+class BaselineMismatch(Exception):
+    pass
+
+
+def add_arguments(parser):
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='allowed throughput drop / p50 rise, as a fraction (default 0.15)')
+    parser.add_argument('--tail-tolerance', type=float, default=0.30,
+                        help='allowed p95/p99 rise, as a fraction (default 0.30)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='latency changes below this are noise (default 0.5)')
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+
+def check_comparable(baseline, current):
+    base_meta, meta = baseline.get('meta', {}), current.get('meta', {})
+    different = [key for key in COMPARABLE if base_meta.get(key) != meta.get(key)]
+    if different:
+        details = ', '.join(f'{key}: {base_meta.get(key)!r} -> {meta.get(key)!r}' for key in different)
+        raise BaselineMismatch(f'Runs are not comparable ({details}); record a new baseline')
+
+def _endpoints(results):
+    return {
+        (scenario, label): stats
+        for scenario, data in results.get('scenarios', {}).items()
+        for label, stats in data.get('endpoints', {}).items()
+    }
+
+def compare(baseline, current, tolerance=0.15, tail_tolerance=0.30, min_delta_ms=0.5):
+    # Returns (rows, regressions). One row per endpoint and metric:
+    # (scenario, endpoint, metric, baseline, current, change, verdict)
+    check_comparable(baseline, current)
+    base, now = _endpoints(baseline), _endpoints(current)
+    ran = set(current.get('scenarios', {}))
+    rows, regressions = [], []
+    for key in sorted(base):
+        scenario, label = key
+        if scenario not in ran:
+            rows.append((scenario, label, '-', None, None, None, 'not run'))
+            continue
+        if key not in now:
+            row = (scenario, label, '-', None, None, None, 'MISSING')
+            rows.append(row)
+            regressions.append(row)
+            continue
+        before, after = base[key], now[key]
+        if after['errors'] > before['errors'] and after['errors'] > 0.01 * after['requests']:
+            row = (scenario, label, 'errors', before['errors'], after['errors'], None, 'REGRESSED')
+            rows.append(row)
+            regressions.append(row)
+        for metric, higher_is_better, tail in METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            allowed = tail_tolerance if tail else tolerance
+            worse = -change if higher_is_better else change
+            if worse > allowed and (higher_is_better or new - old >= min_delta_ms):
+                verdict = 'REGRESSED'
+            elif -worse > allowed and (higher_is_better or old - new >= min_delta_ms):
+                verdict = 'improved'
+            else:
+                verdict = 'ok'
+            row = (scenario, label, metric, old, new, change, verdict)
+            rows.append(row)
+            if verdict == 'REGRESSED':
+                regressions.append(row)
+    for scenario, label in sorted(set(now) - set(base)):
+        rows.append((scenario, label, '-', None, None, None, 'new'))
+    return rows, regressions
+
+def format_rows(rows, only_changed=False):
+    header = f"{'scenario':<16} {'endpoint':<36} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}  verdict"
+    lines = [header, '-' * len(header)]
+    for scenario, label, metric, old, new, change, verdict in rows:
+        if only_changed and verdict == 'ok':
+            continue
+        old_text = '-' if old is None else f'{old:.2f}' if isinstance(old, float) else str(old)
+        new_text = '-' if new is None else f'{new:.2f}' if isinstance(new, float) else str(new)
+        change_text = '-' if change is None else f'{change:+.1%}'
+        lines.append(f'{scenario:<16} {label:<36} {metric:<15} {old_text:>10} {new_text:>10} {change_text:>8}  {verdict}')
+    return '\n'.join(lines)
+
+def gate(baseline, current, args, out=sys.stderr):
+    # Prints the diff and returns the process exit code
+    try:
+        rows, regressions = compare(baseline, current, args.tolerance, args.tail_tolerance, args.min_delta_ms)
+    except BaselineMismatch as e:
+        print(str(e), file=out)
+        return 2
+    print(format_rows(rows, only_changed=getattr(args, 'only_changed', False)), file=out)
+    base_rev = baseline.get('meta', {}).get('revision')
+    rev = current.get('meta', {}).get('revision')
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) against baseline {base_rev} (current {rev})', file=out)
+        return 1
+    print(f'\nNo regressions against baseline {base_rev} (current {rev})', file=out)
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('results')
+    parser.add_argument('--only-changed', action='store_true', help='hide rows within tolerance')
+    add_arguments(parser)
+    args = parser.parse_args()
+    sys.exit(gate(load(args.baseline), load(args.results), args, out=sys.stdout))
+
+if __name__ == '__main__':
+    main()
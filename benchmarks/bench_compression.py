@@ -0,0 +1,101 @@
+"""Bytes on the wire and CPU per response for gzip/brotli compression.
+
+Builds /shop_transactions style payloads (t.* plus customer fields) of
+several sizes, serializes them the way the app does, and compresses each
+at a few levels with the same helpers the after_request hook uses.
+
+    python -m benchmarks.bench_compression --rows 10 100 1000 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from utils.serialization import init_json, jsonify
+from utils import compression
+
+STATUSES = ['Pending', 'Processing', 'Completed', 'Cancelled']
+SERVICES = ['Wash and Fold', 'Wash and Iron', 'Dry Clean', 'Iron Only']
+STREETS = ['Rizal St', 'Mabini Ave', 'Bonifacio Rd', 'Luna St']
+
+def make_rows(count, seed=7):
+    rng = random.Random(seed)
+    started = datetime(2026, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(count):
+        kilo = Decimal(rng.randint(20, 150)) / 10
+        subtotal = kilo * Decimal('45.00')
+        rows.append({
+            'id': 100000 + i,
+            'user_id': rng.randint(1, 5000),
+            'shop_id': 12,
+            'user_name': f'Customer {rng.randint(1, 5000)}',
+            'user_email': f'customer{rng.randint(1, 5000)}@example.com',
+            'user_phone': f'09{rng.randint(100000000, 999999999)}',
+            'service_name': rng.choice(SERVICES),
+            'kilo_amount': kilo,
+            'subtotal': subtotal,
+            'delivery_fee': Decimal('50.00'),
+            'voucher_discount': Decimal('0.00'),
+            'total_amount': subtotal + Decimal('50.00'),
+            'delivery_type': rng.choice(['Pickup', 'Delivery']),
+            'zone': f'Zone {rng.randint(1, 9)}',
+            'street': rng.choice(STREETS),
+            'barangay': f'Barangay {rng.randint(1, 40)}',
+            'building': f'Bldg {rng.randint(1, 200)}',
+            'scheduled_date': (started + timedelta(days=i // 40)).date(),
+            'scheduled_time': timedelta(hours=rng.randint(8, 18)),
+            'payment_method': 'Cash on Delivery',
+            'notes': rng.choice([None, 'Please separate whites', 'Gate code 1234', '']),
+            'status': rng.choice(STATUSES),
+            'created_at': started + timedelta(minutes=17 * i),
+            'updated_at': started + timedelta(minutes=17 * i, seconds=rng.randint(0, 9000)),
+            'customer_name': f'Customer {rng.randint(1, 5000)}',
+            'customer_email': f'customer{rng.randint(1, 5000)}@example.com',
+        })
+    return rows
+
+def cpu_ms(fn, body, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        out = fn(body)
+    return (time.process_time() - started) * 1000 / repeat, len(out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', nargs='+', type=int, default=[10, 100, 1000, 5000])
+    parser.add_argument('--gzip-levels', nargs='+', type=int, default=[1, 6, 9])
+    parser.add_argument('--br-levels', nargs='+', type=int, default=[4, 11])
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    init_json(app)
+
+    codecs = [(f'gzip-{level}', lambda body, level=level: compression.gzip_body(body, level))
+              for level in args.gzip_levels]
+    if compression.brotli is not None:
+        codecs += [(f'br-{level}', lambda body, level=level: compression.brotli_body(body, level))
+                   for level in args.br_levels]
+    else:
+        print('brotli not installed, gzip only\n')
+
+    header = f"{'rows':>6} {'codec':<8} {'raw KB':>9} {'wire KB':>9} {'ratio':>6} {'cpu ms':>8} {'MB/s':>7}"
+    print(header)
+    print('-' * len(header))
+    for count in args.rows:
+        with app.app_context():
+            body = jsonify({'transactions': make_rows(count), 'next_cursor': None}).get_data()
+        repeat = max(3, 2000 // max(count, 1))
+        for name, fn in codecs:
+            ms, size = cpu_ms(fn, body, repeat)
+            print(f"{count:>6} {name:<8} {len(body) / 1024:>9.1f} {size / 1024:>9.1f} "
+                  f"{len(body) / size:>6.1f} {ms:>8.2f} {len(body) / 2**20 / (ms / 1000):>7.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+"""Scripted load scenarios against the app on a synthetic dataset.
+
+Builds (or reuses) the dataset from benchmarks/dataset.py, points the
+connection pool at a scratch copy of it through the SQLite stand-in, and
+replays each scenario from --concurrency threads for --duration seconds
+through Flask's test client:
+
+  browse_shops     shop list, then one shop's services, tiers and items
+  create_order     POST /create_transaction with a basket
+  shop_polling     shop tablets polling /api/orders with If-None-Match,
+                   plus the first page of /shop_transactions
+  status_updates   Pending -> Processing -> Completed with a socket
+                   listener in every affected shop room
+  jwt_auth         POST /verify_token across a pool of customer tokens
+
+Requests go straight into the WSGI app, so the numbers cover routing,
+auth, SQL and serialization but no network. Results are JSON: per
+scenario and per endpoint, throughput and p50/p95/p99 latency. With
+--repeat each scenario runs several times and the median of each metric
+is kept. --save-baseline and --baseline turn a run into a regression
+gate, see benchmarks/baseline.py.
+
+A worker thread that raises (a scenario bug, or status_updates running
+out of Pending orders) fails the whole run with exit status 3: a
+scenario that stopped early would report a truncated window as if it
+were a full one, so nothing is written and no baseline is saved.
+
+    python -m benchmarks.bench_load --duration 10 --concurrency 8 --output results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from collections import deque
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from benchmarks import baseline, dataset, standin
+
+def percentile(sorted_values, pct):
+    # Nearest rank
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(samples, elapsed):
+    # samples: [(latency seconds, status code)] for one endpoint
+    latencies = sorted(latency * 1000 for latency, _ in samples)
+    errors = sum(1 for _, status in samples if status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'max_ms': round(latencies[-1], 3),
+    }
+
+
+class Context:
+    # Shared, read-mostly state for the scenarios
+    def __init__(self, server, args):
+        self.server = server
+        self.users = args.users
+        self.shops = args.shops
+        self.secret = server.app.config['SECRET_KEY']
+        self._tokens = {}
+        # A fixed set of shops with a tablet open, like a real afternoon
+        rng = random.Random(args.seed)
+        self.tablet_shops = rng.sample(range(1, args.shops + 1), min(args.tablets, args.shops))
+
+    def token(self, user_id):
+        token = self._tokens.get(user_id)
+        if token is None:
+            token = self._tokens[user_id] = 'Bearer ' + jwt.encode({
+                'user_id': user_id,
+                'email': f'user{user_id}@example.com',
+                'exp': datetime.utcnow() + timedelta(hours=6)
+            }, self.secret, algorithm='HS256')
+        return token
+
+
+class Scenario:
+    name = None
+
+    def setup(self, ctx):
+        pass
+
+    def run(self, ctx, client, rng, call):
+        raise NotImplementedError
+
+    def report(self, ctx):
+        return {}
+
+
+class BrowseShops(Scenario):
+    name = 'browse_shops'
+
+    def run(self, ctx, client, rng, call):
+        headers = {'Authorization': ctx.token(rng.randint(ctx.shops + 1, ctx.users))}
+        call('GET /shops', 'GET', '/shops', headers=headers)
+        shop_id = rng.randint(1, ctx.shops)
+        call('GET /shop/<id>/services', 'GET', f'/shop/{shop_id}/services', headers=headers)
+        call('GET /shop/<id>/kilo-prices', 'GET', f'/shop/{shop_id}/kilo-prices', headers=headers)
+        call('GET /shop/<id>/household', 'GET', f'/shop/{shop_id}/household', headers=headers)
+        call('GET /shop/<id>/clothing', 'GET', f'/shop/{shop_id}/clothing', headers=headers)
+
+
+class CreateOrder(Scenario):
+    name = 'create_order'
+
+    def run(self, ctx, client, rng, call):
+        user_id = rng.randint(ctx.shops + 1, ctx.users)
+        kilo = rng.randint(10, 300) / 10
+        subtotal = round(kilo * 40, 2)
+        call('POST /create_transaction/<id>', 'POST', f'/create_transaction/{user_id}',
+             headers={'Authorization': ctx.token(user_id)},
+             json={
+                 'shop_id': rng.randint(1, ctx.shops),
+                 'services': rng.sample(dataset.SERVICES, rng.randint(1, 2)),
+                 'kilo_amount': kilo,
+                 'subtotal': subtotal,
+                 'delivery_fee': 50,
+                 'voucher_discount': 0,
+                 'total_amount': subtotal + 50,
+                 'delivery_type': 'Delivery',
+                 'zone': 'Zone 3',
+                 'street': 'Rizal St',
+                 'barangay': 'Barangay 12',
+                 'building': 'House',
+                 'scheduled_date': (date.today() + timedelta(days=1)).isoformat(),
+                 'scheduled_time': '10:00:00',
+                 'notes': 'benchmark',
+                 'selected_items': {rng.choice(dataset.CLOTHING): rng.randint(1, 5),
+                                    rng.choice(dataset.HOUSEHOLD): rng.randint(0, 2)},
+             })
+
+
+class ShopPolling(Scenario):
+    name = 'shop_polling'
+
+    def run(self, ctx, client, rng, call):
+        shop_id = rng.choice(ctx.tablet_shops)
+        headers = {'Authorization': ctx.token(shop_id)}
+        # Each tablet keeps the ETag of its last full response
+        etags = client.etags
+        if shop_id in etags:
+            headers['If-None-Match'] = etags[shop_id]
+        response = call('GET /api/orders', 'GET', f'/api/orders?shop_id={shop_id}', headers=headers)
+        if response.status_code == 200 and response.headers.get('ETag'):
+            etags[shop_id] = response.headers['ETag']
+        call('GET /shop_transactions/<id>', 'GET', f'/shop_transactions/{shop_id}?limit=20',
+             headers={'Authorization': ctx.token(shop_id)})
+
+
+class StatusUpdates(Scenario):
+    name = 'status_updates'
+    NEXT = {'Pending': 'Processing', 'Processing': 'Completed'}
+
+    def setup(self, ctx):
+        # Pending orders of the tablet shops, each walked to Completed
+        placeholders = ', '.join('%s' for _ in ctx.tablet_shops)
+        rows = ctx.server.fetch_all(f"""
+            SELECT id, shop_id FROM transactions
+            WHERE status = 'Pending' AND shop_id IN ({placeholders})
+            ORDER BY id DESC LIMIT 50000
+        """, tuple(ctx.tablet_shops))
+        self.queue = deque((row['id'], row['shop_id'], 'Pending') for row in rows)
+        self.updates = 0
+        self._lock = threading.Lock()
+        self.listeners = []
+        for shop_id in ctx.tablet_shops:
+            listener = ctx.server.socketio.test_client(ctx.server.app)
+            listener.emit('join_shop_room', {'shop_id': shop_id})
+            listener.get_received()
+            self.listeners.append(listener)
+
+    def run(self, ctx, client, rng, call):
+        try:
+            transaction_id, shop_id, status = self.queue.popleft()
+        except IndexError:
+            raise RuntimeError('status_updates ran out of Pending orders; use a larger dataset')
+        status = self.NEXT[status]
+        response = call('PUT /update_transaction_status/<id>', 'PUT',
+                        f'/update_transaction_status/{transaction_id}',
+                        headers={'Authorization': ctx.token(shop_id)},
+                        json={'status': status})
+        if response.status_code == 200:
+            with self._lock:
+                self.updates += 1
+            if status in self.NEXT:
+                self.queue.append((transaction_id, shop_id, status))
+
+    def report(self, ctx):
+        delivered = 0
+        for listener in self.listeners:
+            delivered += sum(1 for packet in listener.get_received() if packet['name'] == 'status_update')
+            listener.disconnect()
+        return {'socket_listeners': len(self.listeners),
+                'status_updates': self.updates,
+                'socket_events_delivered': delivered}
+
+
+class JwtAuth(Scenario):
+    name = 'jwt_auth'
+    TOKENS = 500
+
+    def run(self, ctx, client, rng, call):
+        user_id = ctx.shops + 1 + rng.randrange(min(self.TOKENS, ctx.users - ctx.shops))
+        call('POST /verify_token', 'POST', '/verify_token',
+             headers={'Authorization': ctx.token(user_id)})
+
+
+SCENARIOS = {cls.name: cls for cls in (BrowseShops, CreateOrder, ShopPolling, StatusUpdates, JwtAuth)}
+
+
+class ScenarioCrashed(Exception):
+    pass
+
+
+def _worker(ctx, scenario, seed, deadline, samples, failures, crashes):
+    client = ctx.server.app.test_client()
+    client.etags = {}
+    rng = random.Random(seed)
+
+    def call(label, method, url, **kwargs):
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        samples.append((label, time.perf_counter() - started, response.status_code))
+        if response.status_code >= 400 and label not in failures:
+            failures[label] = f'{response.status_code} {response.get_data(as_text=True)[:300]}'
+        return response
+
+    try:
+        while time.perf_counter() < deadline:
+            scenario.run(ctx, client, rng, call)
+    except Exception as e:
+        crashes.append(f'{type(e).__name__}: {e}')
+
+def run_scenario(ctx, scenario, args):
+    scenario.setup(ctx)
+    results = {}
+    for phase, seconds in (('warmup', args.warmup), ('measure', args.duration)):
+        if seconds <= 0:
+            continue
+        per_thread = [[] for _ in range(args.concurrency)]
+        failures = {}
+        crashes = []
+        started = time.perf_counter()
+        deadline = started + seconds
+        threads = [
+            threading.Thread(target=_worker, args=(ctx, scenario, args.seed * 1000 + i, deadline,
+                                                   per_thread[i], failures, crashes))
+            for i in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if crashes:
+            raise ScenarioCrashed(f'{scenario.name}: {len(crashes)} of {args.concurrency} worker threads '
+                                  f'died during {phase} after {elapsed:.2f}s: {crashes[0]}')
+        if phase == 'measure':
+            by_label = {}
+            for samples in per_thread:
+                for label, latency, status in samples:
+                    by_label.setdefault(label, []).append((latency, status))
+            total = sum(len(samples) for samples in by_label.values())
+            results = {
+                'duration_s': round(elapsed, 3),
+                'requests': total,
+                'throughput_rps': round(total / elapsed, 1),
+                'endpoints': {label: summarize(samples, elapsed) for label, samples in sorted(by_label.items())},
+                'failures': failures,
+            }
+    results.update(scenario.report(ctx))
+    return results
+
+def merge_runs(runs):
+    # Median of every endpoint metric over repeated runs; counts add up
+    if len(runs) == 1:
+        return runs[0]
+    merged = {'repeat': len(runs), 'failures': {}}
+    for run in runs:
+        for key, value in run.items():
+            if key in ('endpoints', 'failures', 'throughput_rps'):
+                continue
+            merged[key] = merged.get(key, 0) + value
+        for label, message in run.get('failures', {}).items():
+            merged['failures'].setdefault(label, message)
+    merged['throughput_rps'] = statistics.median(run['throughput_rps'] for run in runs)
+    endpoints = {}
+    labels = sorted({label for run in runs for label in run.get('endpoints', {})})
+    for label in labels:
+        stats = [run['endpoints'][label] for run in runs if label in run.get('endpoints', {})]
+        endpoints[label] = {
+            metric: (sum(s[metric] for s in stats) if metric in ('requests', 'errors')
+                     else round(statistics.median(s[metric] for s in stats), 3))
+            for metric in stats[0]
+        }
+    merged['endpoints'] = endpoints
+    return merged
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=standin.ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def add_arguments(parser):
+    dataset.add_arguments(parser)
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--tablets', type=int, default=20, help='shops with a tablet polling')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scenario, medians are reported')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--save-baseline', metavar='PATH', help='store this run as the baseline')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='compare against this baseline and exit 1 on a regression')
+    parser.add_argument('--only-changed', action='store_true', help='diff shows only rows outside tolerance')
+    baseline.add_arguments(parser)
+
+def run(args, log=None):
+    log = log or (lambda message: print(message, file=sys.stderr))
+    source = dataset.ensure(args, log=log)
+    scratch = source + f'.run-{os.getpid()}'
+    # Orders are created and updated, so every run starts from a fresh copy
+    shutil.copyfile(source, scratch)
+
+    os.environ.setdefault('CACHE_BUS', 'local')
+    os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'threading')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Per-query warnings would drown the progress output; the per-endpoint
+    # percentiles already show slow routes
+    os.environ.setdefault('SLOW_QUERY_MS', '60000')
+    os.environ.setdefault('MYSQL_POOL_SIZE', str(args.concurrency + 2))
+    warnings.simplefilter('ignore')
+    standin.install(scratch)
+    try:
+        # The routes print on every socket join and most errors
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app as server
+            ctx = Context(server, args)
+            scenarios = {}
+            for name in args.scenarios:
+                log(f'{name}: {args.warmup:g}s warmup, {args.duration:g}s x {args.concurrency} threads')
+                scenarios[name] = merge_runs([run_scenario(ctx, SCENARIOS[name](), args)
+                                              for _ in range(args.repeat)])
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(scratch + suffix)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'dataset': {key: getattr(args, key) for key in ('users', 'shops', 'transactions',
+                                                             'notifications', 'seed')},
+            'duration_s': args.duration,
+            'concurrency': args.concurrency,
+            'tablets': args.tablets,
+            'repeat': args.repeat,
+        },
+        'scenarios': scenarios,
+    }
+
+def print_table(results, out=sys.stderr):
+    header = f"{'scenario':<16} {'endpoint':<36} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    print(header, file=out)
+    print('-' * len(header), file=out)
+    for name, scenario in results['scenarios'].items():
+        for label, stats in scenario.get('endpoints', {}).items():
+            print(f"{name:<16} {label:<36} {stats['requests']:>7} {stats['errors']:>5} "
+                  f"{stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                  f"{stats['p99_ms']:>8.2f}", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f'baseline {args.baseline} does not exist; record one with --save-baseline')
+
+    try:
+        results = run(args)
+    except ScenarioCrashed as e:
+        print(f'{e}\nrun aborted: no results written, baseline not saved', file=sys.stderr)
+        sys.exit(3)
+    print_table(results)
+    if args.output:
+        baseline.save(results, args.output)
+    elif not (args.save_baseline or args.baseline):
+        print(json.dumps(results, indent=2))
+    if args.save_baseline:
+        baseline.save(results, args.save_baseline)
+        print(f'baseline saved to {args.save_baseline}', file=sys.stderr)
+    if args.baseline:
+        sys.exit(baseline.gate(baseline.load(args.baseline), results, args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Rows/sec for serializing a /shop_transactions style list.
+
+Compares the per-row isinstance loop the routes used to run before
+jsonify against the shared encoder (stdlib and orjson backends).
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify as flask_jsonify
+from utils import serialization
+from utils.serialization import init_json, jsonify
+
+def make_rows(count):
+    created = datetime(2025, 5, 1, 8, 0, 0)
+    rows = []
+    for i in range(count):
+        rows.append({
+            'id': i + 1,
+            'user_id': 1 + i % 500,
+            'shop_id': 1 + i % 20,
+            'user_name': f'Customer {i % 500}',
+            'user_email': f'customer{i % 500}@example.com',
+            'user_phone': '09171234567',
+            'service_name': 'Wash & Fold',
+            'services': '["Wash & Fold", "Dry Clean"]',
+            'kilo_amount': Decimal('6.50'),
+            'subtotal': Decimal('195.00'),
+            'delivery_fee': Decimal('30.00'),
+            'voucher_discount': Decimal('0.00'),
+            'total_amount': Decimal('225.00'),
+            'delivery_type': 'Pick-up & Delivery',
+            'zone': '4',
+            'street': 'Rizal Avenue',
+            'barangay': 'Poblacion',
+            'building': 'Unit 3B',
+            'scheduled_date': date(2025, 5, 2),
+            'scheduled_time': timedelta(hours=9, minutes=30),
+            'payment_method': 'Cash on Delivery',
+            'notes': '',
+            'status': 'Pending',
+            'created_at': created + timedelta(minutes=i),
+            'customer_name': f'Customer {i % 500}',
+            'customer_email': f'customer{i % 500}@example.com',
+        })
+    return rows
+
+def legacy(rows):
+    # What get_shop_transactions did before the shared encoder
+    formatted_transactions = []
+    for transaction in rows:
+        formatted_transaction = {}
+        for key, value in transaction.items():
+            if isinstance(value, datetime):
+                formatted_transaction[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+            elif isinstance(value, timedelta):
+                total_seconds = int(value.total_seconds())
+                hours = total_seconds // 3600
+                minutes = (total_seconds % 3600) // 60
+                seconds = total_seconds % 60
+                formatted_transaction[key] = f"{hours:02}:{minutes:02}:{seconds:02}"
+            elif isinstance(value, Decimal):
+                formatted_transaction[key] = float(value)
+            else:
+                formatted_transaction[key] = value
+        formatted_transactions.append(formatted_transaction)
+    return flask_jsonify({'transactions': formatted_transactions})
+
+def shared(rows):
+    return jsonify({'transactions': rows})
+
+def measure(app, fn, rows, repeat):
+    best = None
+    with app.app_context():
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn(rows).get_data()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    app = Flask(__name__)
+    init_json(app)
+
+    cases = [('legacy loop + flask.jsonify', lambda r: legacy(r), {})]
+    cases.append(('shared encoder (stdlib)', shared, {'JSON_FAST_BACKEND': False}))
+    if serialization.orjson is not None:
+        cases.append(('shared encoder (orjson)', shared, {'JSON_FAST_BACKEND': True}))
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    for name, fn, config in cases:
+        app.config.update(config)
+        elapsed = measure(app, fn, rows, args.repeat)
+        print(f"  {name:<30} {elapsed * 1000:8.1f} ms  {args.rows / elapsed:12,.0f} rows/sec")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Idle socket memory and emit fan-out latency, threading vs gevent serving.
+
+Starts the app in a child process for each mode, connects N websocket
+clients that all join one shop room, then records the server's RSS and
+thread count and times socketio.emit() to that room until every client
+has the event. The clients run on one selector loop in this process, so
+the client side costs the same for both modes.
+
+    python -m benchmarks.bench_sockets --modes threading gevent --clients 1000 5000 10000
+
+gevent mode needs gevent installed. Raise the file descriptor limit
+(ulimit -n) above the client count first.
+"""
+import argparse
+import json
+import os
+import resource
+import selectors
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def serve(mode, port):
+    os.environ['SOCKETIO_ASYNC_MODE'] = mode
+    os.environ.setdefault('CACHE_BUS', 'local')
+    if mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    import logging
+    logging.disable(logging.INFO)
+    import app as server
+
+    @server.app.route('/_bench/emit')
+    def bench_emit():
+        server.socketio.emit('new_transaction', {'sent': time.time()}, room='shop_1')
+        return 'ok'
+
+    server.socketio.run(server.app, host='127.0.0.1', port=port,
+                        allow_unsafe_werkzeug=True, log_output=False)
+
+def proc_status(pid):
+    fields = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            fields[key] = value.strip()
+    return int(fields['VmRSS'].split()[0]) * 1024, int(fields['Threads'])
+
+class Client:
+    def __init__(self, port):
+        from wsproto import WSConnection, ConnectionType
+        from wsproto.events import Request
+        self.ws = WSConnection(ConnectionType.CLIENT)
+        self.sock = socket.create_connection(('127.0.0.1', port))
+        self.sock.setblocking(False)
+        self.joined = False
+        self.received = []
+        self.sock.sendall(self.ws.send(Request(host='127.0.0.1', target='/socket.io/?EIO=4&transport=websocket')))
+
+    def send_text(self, text):
+        from wsproto.events import TextMessage
+        self.sock.sendall(self.ws.send(TextMessage(data=text)))
+
+    def on_readable(self):
+        from wsproto.events import TextMessage, Ping, CloseConnection
+        try:
+            data = self.sock.recv(65536)
+        except BlockingIOError:
+            return
+        if not data:
+            raise ConnectionError('server closed the connection')
+        self.ws.receive_data(data)
+        now = time.time()
+        for event in self.ws.events():
+            if isinstance(event, Ping):
+                self.sock.sendall(self.ws.send(event.response()))
+            elif isinstance(event, CloseConnection):
+                raise ConnectionError('server closed the websocket')
+            elif isinstance(event, TextMessage):
+                self.on_packet(event.data, now)
+
+    def on_packet(self, packet, now):
+        if packet.startswith('0{'):
+            self.send_text('40')
+        elif packet.startswith('40'):
+            self.send_text('42' + json.dumps(['join_shop_room', {'shop_id': 1}]))
+        elif packet == '2':
+            self.send_text('3')
+        elif packet.startswith('42'):
+            name, payload = json.loads(packet[2:])[:2]
+            if name == 'room_joined':
+                self.joined = True
+            elif name == 'new_transaction':
+                self.received.append(now - payload['sent'])
+
+def pump(selector, until, deadline):
+    while not until() and time.time() < deadline:
+        for key, _ in selector.select(timeout=0.05):
+            try:
+                key.data.on_readable()
+            except (ConnectionError, OSError):
+                selector.unregister(key.fileobj)
+                key.data.sock.close()
+
+def wait_for_port(server, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'server exited with status {server.returncode} '
+                               f'(run it with --serve to see why)')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server did not start on port {port}')
+
+def run(mode, count, port, rounds, batch):
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.bench_sockets', '--serve', mode, '--port', str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    selector = selectors.DefaultSelector()
+    clients = []
+    try:
+        wait_for_port(server, port)
+        time.sleep(0.5)
+        base_rss, base_threads = proc_status(server.pid)
+
+        connect_started = time.time()
+        failed = 0
+        for start in range(0, count, batch):
+            fresh = []
+            for _ in range(min(batch, count - start)):
+                try:
+                    client = Client(port)
+                except OSError:
+                    failed += 1
+                    continue
+                selector.register(client.sock, selectors.EVENT_READ, client)
+                fresh.append(client)
+            pump(selector, lambda: all(c.joined for c in fresh), time.time() + 30)
+            clients.extend(c for c in fresh if c.joined)
+            failed += sum(1 for c in fresh if not c.joined)
+        connect_seconds = time.time() - connect_started
+
+        time.sleep(2)
+        rss, threads = proc_status(server.pid)
+
+        fanout = []
+        for _ in range(rounds):
+            for client in clients:
+                client.received.clear()
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/_bench/emit', timeout=60).read()
+            pump(selector, lambda: all(c.received for c in clients), time.time() + 60)
+            latencies = [c.received[0] for c in clients if c.received]
+            if latencies:
+                fanout.append((max(latencies), statistics.median(latencies), len(latencies)))
+            time.sleep(0.2)
+
+        connected = len(clients)
+        return {
+            'mode': mode,
+            'clients': count,
+            'connected': connected,
+            'failed': failed,
+            'connect_seconds': round(connect_seconds, 2),
+            'rss_mb': round(rss / 2**20, 1),
+            'kb_per_socket': round((rss - base_rss) / 1024 / connected, 1) if connected else None,
+            'threads': threads,
+            'fanout_median_ms': round(statistics.median(f[1] for f in fanout) * 1000, 1) if fanout else None,
+            'fanout_last_ms': round(statistics.median(f[0] for f in fanout) * 1000, 1) if fanout else None,
+            'delivered': min(f[2] for f in fanout) if fanout else 0,
+        }
+    finally:
+        for client in clients:
+            client.sock.close()
+        selector.close()
+        server.kill()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['threading', 'gevent'])
+    parser.add_argument('--clients', nargs='+', type=int, default=[1000, 5000, 10000])
+    parser.add_argument('--rounds', type=int, default=5, help='emits timed per run')
+    parser.add_argument('--batch', type=int, default=200, help='clients connected at a time')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = max(args.clients) + 100
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    header = (f"{'mode':<10} {'clients':>7} {'conn':>6} {'rss MB':>8} {'KB/sock':>8} "
+              f"{'threads':>7} {'fan-out p50 ms':>15} {'last ms':>8}")
+    print(header)
+    print('-' * len(header))
+    for count in args.clients:
+        for mode in args.modes:
+            try:
+                r = run(mode, count, args.port, args.rounds, args.batch)
+            except Exception as e:
+                print(f"{mode:<10} {count:>7} failed: {e}")
+                continue
+            print(f"{r['mode']:<10} {r['clients']:>7} {r['connected']:>6} {r['rss_mb']:>8} "
+                  f"{r['kb_per_socket']!s:>8} {r['threads']:>7} {r['fanout_median_ms']!s:>15} "
+                  f"{r['fanout_last_ms']!s:>8}")
+
+if __name__ == '__main__':
+    main()
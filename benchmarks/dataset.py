@@ -0,0 +1,210 @@
+"""Synthetic LabaRide dataset in the SQLite stand-in.
+
+Users, shops (each with services, household items, clothing types and kilo
+tiers), transactions and notifications, generated from a seed so the same
+arguments always give the same rows. The file is built once and reused by
+later runs with the same arguments.
+
+    python -m benchmarks.dataset --users 20000 --shops 200 --transactions 2000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+from benchmarks import standin
+
+DEFAULT_DIR = os.path.join(os.getenv('TMPDIR', '/tmp'), 'labaride-bench')
+PASSWORD = 'benchmark'
+BATCH = 20000
+
+STATUSES = ['Pending', 'Processing', 'Completed', 'Cancelled']
+# Most of a long-running shop's history is finished work
+STATUS_WEIGHTS = [5, 5, 80, 10]
+SERVICES = ['Wash and Fold', 'Wash and Iron', 'Dry Clean', 'Iron Only', 'Comforter']
+HOUSEHOLD = ['Bedsheet', 'Pillowcase', 'Curtain', 'Blanket', 'Towel', 'Rug']
+CLOTHING = ['Shirt', 'Pants', 'Dress', 'Jacket', 'Uniform', 'Barong']
+BARANGAYS = [f'Barangay {i}' for i in range(1, 41)]
+STREETS = ['Rizal St', 'Mabini Ave', 'Bonifacio Rd', 'Luna St', 'Burgos St']
+# (min, max) kilo tiers every shop gets, with its own price per kilo
+KILO_TIERS = [(Decimal('0.00'), Decimal('5.00')), (Decimal('5.01'), Decimal('10.00')),
+              (Decimal('10.01'), Decimal('50.00'))]
+EPOCH = datetime(2024, 1, 1)
+
+def default_path(args):
+    name = f'u{args.users}-s{args.shops}-t{args.transactions}-n{args.notifications}-seed{args.seed}.sqlite3'
+    return os.path.join(DEFAULT_DIR, name)
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--shops', type=int, default=200)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--notifications', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=1025)
+    parser.add_argument('--db', help='SQLite file, default is derived from the arguments')
+
+def _insert(conn, table, columns, rows):
+    placeholders = ', '.join('?' for _ in columns)
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+def _batches(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _users(rng, count, password_hash, span_days):
+    for i in range(1, count + 1):
+        yield (
+            i, f'User {i}', f'user{i}@example.com', password_hash,
+            f'09{rng.randint(100000000, 999999999)}',
+            f'Zone {rng.randint(1, 9)}', rng.choice(STREETS), rng.choice(BARANGAYS),
+            f'Bldg {rng.randint(1, 200)}', 0,
+            EPOCH + timedelta(minutes=rng.randint(0, span_days * 1440)),
+        )
+
+def _shop(rng, shop_id, owner_id):
+    return (
+        shop_id, owner_id, f'Laundry Shop {shop_id}', f'09{rng.randint(100000000, 999999999)}',
+        f'Zone {rng.randint(1, 9)}', rng.choice(STREETS), rng.choice(BARANGAYS), f'Unit {shop_id}',
+        '08:00', '20:00', EPOCH,
+        round(rng.uniform(14.5, 14.7), 6), round(rng.uniform(120.9, 121.1), 6),
+    )
+
+def _transactions(rng, count, users, shops, span_days):
+    # Ascending created_at, so ids and time agree like in production
+    step = span_days * 86400 / max(count, 1)
+    for i in range(count):
+        user_id = rng.randint(1, users)
+        kilo = Decimal(rng.randint(10, 300)) / 10
+        subtotal = (kilo * Decimal(rng.choice(['35.00', '40.00', '45.00']))).quantize(Decimal('0.01'))
+        delivery_fee = Decimal(rng.choice(['0.00', '50.00']))
+        created = EPOCH + timedelta(seconds=int(i * step))
+        service = rng.choice(SERVICES)
+        yield (
+            user_id, rng.randint(1, shops), f'User {user_id}', f'user{user_id}@example.com',
+            '09170000000', service, f'["{service}"]', kilo, subtotal, delivery_fee, Decimal('0.00'),
+            subtotal + delivery_fee, 'Delivery' if delivery_fee else 'Pickup',
+            f'Zone {rng.randint(1, 9)}', rng.choice(STREETS), rng.choice(BARANGAYS), 'House',
+            (created + timedelta(days=1)).date(), timedelta(hours=rng.randint(8, 18)),
+            'Cash on Delivery', rng.choice([None, '', 'Separate whites', 'Gate code 1234']),
+            rng.choices(STATUSES, STATUS_WEIGHTS)[0], created,
+            created + timedelta(seconds=rng.randint(0, 7200)),
+        )
+
+def _notifications(rng, count, users, transactions, span_days):
+    step = span_days * 86400 / max(count, 1)
+    for i in range(count):
+        created = EPOCH + timedelta(seconds=int(i * step))
+        yield (
+            rng.randint(1, users), rng.randint(1, max(transactions, 1)),
+            'Your laundry price has been updated', f'Laundry Shop {rng.randint(1, 50)}',
+            rng.choice(['pending', 'accepted', 'cancelled']), rng.randint(0, 1), created,
+        )
+
+def build(path, users=20000, shops=200, transactions=1000000, notifications=200000, seed=1025,
+          span_days=365, log=print):
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(partial)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    indexes = standin.create_schema(conn)
+
+    # One low-cost hash for everyone; logins are not what this measures
+    password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8')
+    for batch in _batches(_users(rng, users, password_hash, span_days)):
+        _insert(conn, 'users', ('id', 'name', 'email', 'password', 'phone', 'zone', 'street',
+                                'barangay', 'building', 'is_shop_owner', 'created_at'), batch)
+
+    # The first `shops` users own one shop each
+    conn.execute('UPDATE users SET is_shop_owner = 1 WHERE id <= ?', (shops,))
+    _insert(conn, 'shops', ('id', 'user_id', 'shop_name', 'contact_number', 'zone', 'street', 'barangay',
+                            'building', 'opening_time', 'closing_time', 'created_at', 'latitude',
+                            'longitude'), [_shop(rng, i, i) for i in range(1, shops + 1)])
+    for shop_id in range(1, shops + 1):
+        _insert(conn, 'shop_services', ('shop_id', 'service_name', 'price', 'color'),
+                [(shop_id, name, Decimal(rng.randint(30, 80)), '#2196F3')
+                 for name in rng.sample(SERVICES, rng.randint(2, len(SERVICES)))])
+        _insert(conn, 'household_items', ('shop_id', 'item_name', 'price'),
+                [(shop_id, name, Decimal(rng.randint(20, 150)))
+                 for name in rng.sample(HOUSEHOLD, rng.randint(2, len(HOUSEHOLD)))])
+        _insert(conn, 'clothing_types', ('shop_id', 'type_name', 'price'),
+                [(shop_id, name, Decimal(rng.randint(10, 90)))
+                 for name in rng.sample(CLOTHING, rng.randint(2, len(CLOTHING)))])
+        _insert(conn, 'kilo_prices', ('shop_id', 'min_kilo', 'max_kilo', 'price_per_kilo'),
+                [(shop_id, low, high, Decimal(rng.randint(30, 50)))
+                 for low, high in KILO_TIERS])
+    log(f'users and {shops} shop catalogs: {time.perf_counter() - started:.1f}s')
+
+    columns = ('user_id', 'shop_id', 'user_name', 'user_email', 'user_phone', 'service_name', 'services',
+               'kilo_amount', 'subtotal', 'delivery_fee', 'voucher_discount', 'total_amount',
+               'delivery_type', 'zone', 'street', 'barangay', 'building', 'scheduled_date',
+               'scheduled_time', 'payment_method', 'notes', 'status', 'created_at', 'updated_at')
+    for done, batch in enumerate(_batches(_transactions(rng, transactions, users, shops, span_days)), 1):
+        _insert(conn, 'transactions', columns, batch)
+        if done % 25 == 0:
+            log(f'  transactions: {done * BATCH:,}')
+    log(f'{transactions:,} transactions: {time.perf_counter() - started:.1f}s')
+
+    for batch in _batches(_notifications(rng, notifications, users, transactions, span_days)):
+        _insert(conn, 'notifications', ('user_id', 'transaction_id', 'message', 'from_name', 'status',
+                                        'is_read', 'created_at'), batch)
+
+    # Same backfill database/database.sql runs for the rollup tables
+    conn.execute("""
+        INSERT INTO shop_daily_stats (shop_id, day, orders, cancelled, revenue, kilos)
+        SELECT shop_id, DATE(created_at), COUNT(*),
+               SUM(status = 'Cancelled'),
+               SUM(CASE WHEN status = 'Cancelled' THEN 0 ELSE total_amount END),
+               SUM(CASE WHEN status = 'Cancelled' THEN 0 ELSE kilo_amount END)
+        FROM transactions GROUP BY shop_id, DATE(created_at)
+    """)
+    conn.execute("""
+        INSERT INTO shop_status_stats (shop_id, status, orders, revenue, kilos)
+        SELECT shop_id, status, COUNT(*), SUM(total_amount), SUM(kilo_amount)
+        FROM transactions GROUP BY shop_id, status
+    """)
+    conn.commit()
+    standin.create_indexes(conn, indexes)
+    conn.commit()
+    conn.close()
+    os.replace(partial, path)
+    log(f'built {path} in {time.perf_counter() - started:.1f}s')
+    return path
+
+def ensure(args, log=print):
+    path = args.db or default_path(args)
+    if not os.path.exists(path):
+        build(path, args.users, args.shops, args.transactions, args.notifications, args.seed, log=log)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--force', action='store_true', help='rebuild even if the file exists')
+    args = parser.parse_args()
+    path = args.db or default_path(args)
+    if args.force or not os.path.exists(path):
+        build(path, args.users, args.shops, args.transactions, args.notifications, args.seed)
+    else:
+        print(f'{path} already exists, use --force to rebuild')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,422 @@
+"""SQLite stand-in for the MySQL server, for local benchmark runs.
+
+connector(path) returns a factory that database.connection can use in place
+of mysql.connector.connect(). The connections and cursors it makes look
+like mysql-connector ones to the app: %s placeholders, dictionary cursors,
+lastrowid, DECIMAL/DATE/TIME/TIMESTAMP values as Decimal/date/timedelta/
+datetime. The handful of MySQL functions the app uses are registered on
+each connection or rewritten to their SQLite spelling.
+
+The schema comes from Procfile/labaride_backup.sql, translated table by
+table, plus the columns and tables the code relies on that the dump
+predates (see SCHEMA_ADDITIONS).
+
+This is not MySQL. Absolute numbers only mean something when compared
+with another run on the same machine and the same stand-in.
+"""
+import os
+import re
+import sqlite3
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+import mysql.connector
+from mysql.connector import errorcode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKUP_SCHEMA = os.path.join(ROOT, 'Procfile', 'labaride_backup.sql')
+
+# Columns the code reads or writes that labaride_backup.sql does not have.
+# transactions.services is what TransactionController inserts into and
+# price_per_kilo what /api/orders/<id>/set_price writes; updated_at comes
+# from database/database.sql.
+EXTRA_COLUMNS = {
+    'transactions': [
+        "`services` text",
+        "`price_per_kilo` decimal(10,2) DEFAULT NULL",
+        "`updated_at` timestamp NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))",
+    ],
+}
+
+# TransactionController inserts into services and leaves service_name out,
+# which the live table evidently allows
+COLUMN_OVERRIDES = {
+    ('transactions', 'service_name'): "`service_name` varchar(50) DEFAULT NULL",
+}
+
+# Tables from database/database.sql, and ones only the queries in app.py
+# and the controllers describe, in SQLite syntax
+SCHEMA_ADDITIONS = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INTEGER NOT NULL,
+    idempotency_key varchar(255) NOT NULL,
+    request_hash char(64) NOT NULL,
+    status text NOT NULL DEFAULT 'processing',
+    response_status smallint,
+    response_body text,
+    -- Compared with NOW(), which is local time like MySQL's
+    created_at timestamp DEFAULT (datetime('now', 'localtime')),
+    expires_at timestamp NOT NULL,
+    PRIMARY KEY (user_id, idempotency_key)
+);
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    transaction_id INTEGER,
+    message text NOT NULL,
+    from_name varchar(255),
+    status varchar(20) DEFAULT 'pending',
+    is_read tinyint(1) DEFAULT 0,
+    created_at timestamp DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS household_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shop_id INTEGER NOT NULL,
+    item_name varchar(255) NOT NULL,
+    price decimal(10,2) DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS clothing_types (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shop_id INTEGER NOT NULL,
+    type_name varchar(255) NOT NULL,
+    price decimal(10,2) DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS transaction_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id INTEGER NOT NULL,
+    item_name varchar(255) NOT NULL,
+    quantity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shop_daily_stats (
+    shop_id INTEGER NOT NULL,
+    day date NOT NULL,
+    orders INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    revenue decimal(14,2) NOT NULL DEFAULT 0,
+    kilos decimal(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (shop_id, day)
+);
+CREATE TABLE IF NOT EXISTS shop_status_stats (
+    shop_id INTEGER NOT NULL,
+    status varchar(20) NOT NULL,
+    orders INTEGER NOT NULL DEFAULT 0,
+    revenue decimal(14,2) NOT NULL DEFAULT 0,
+    kilos decimal(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (shop_id, status)
+);
+CREATE TRIGGER IF NOT EXISTS transactions_touch AFTER UPDATE ON transactions
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE transactions SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+END;
+"""
+
+# Created after the bulk load, same as database/database.sql
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_shop_created ON transactions (shop_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_updated ON transactions (user_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_shop_updated ON transactions (shop_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_household_items_shop ON household_items (shop_id);
+CREATE INDEX IF NOT EXISTS idx_clothing_types_shop ON clothing_types (shop_id);
+CREATE INDEX IF NOT EXISTS idx_transaction_items_transaction ON transaction_items (transaction_id);
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at);
+"""
+
+_CREATE_TABLE = re.compile(r'CREATE TABLE `(\w+)` \((.*?)\n\)[^;]*;', re.S)
+_KEY = re.compile(r'^(UNIQUE )?KEY `(\w+)` \((.*)\)$')
+
+def _read_backup(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    # mysqldump output saved from PowerShell: UTF-16 with a BOM, CRLF
+    text = raw.decode('utf-16') if raw[:2] in (b'\xff\xfe', b'\xfe\xff') else raw.decode('utf-8')
+    return text.replace('\r\n', '\n')
+
+def translate_table(name, body):
+    # One mysqldump CREATE TABLE -> SQLite CREATE TABLE plus its indexes
+    columns, constraints, indexes = [], [], []
+    for line in body.split('\n'):
+        line = line.strip().rstrip(',')
+        if not line:
+            continue
+        if line.startswith('PRIMARY KEY'):
+            if 'AUTO_INCREMENT' not in body:
+                constraints.append(line)
+            continue
+        if line.startswith('CONSTRAINT'):
+            # Foreign keys stay off, as they would after a bulk import
+            continue
+        key = _KEY.match(line)
+        if key:
+            unique, key_name, cols = key.groups()
+            if unique:
+                constraints.append(f'UNIQUE ({cols})')
+            else:
+                indexes.append(f'CREATE INDEX IF NOT EXISTS `{name}_{key_name}` ON `{name}` ({cols});')
+            continue
+        line = re.sub(r' ON UPDATE CURRENT_TIMESTAMP(\(\d\))?', '', line)
+        line = re.sub(r"\benum\([^)]*\)", 'varchar(20)', line)
+        column = line.split()[0].strip('`')
+        if 'AUTO_INCREMENT' in line:
+            line = f'`{column}` INTEGER PRIMARY KEY AUTOINCREMENT'
+        line = COLUMN_OVERRIDES.get((name, column), line)
+        columns.append(line)
+    columns.extend(EXTRA_COLUMNS.get(name, []))
+    ddl = f'CREATE TABLE IF NOT EXISTS `{name}` (\n  ' + ',\n  '.join(columns + constraints) + '\n);'
+    return ddl, indexes
+
+def backup_schema(path=BACKUP_SCHEMA):
+    # (tables DDL, index DDL) for every table in the dump
+    tables, indexes = [], []
+    for name, body in _CREATE_TABLE.findall(_read_backup(path)):
+        ddl, table_indexes = translate_table(name, body)
+        tables.append(ddl)
+        indexes.extend(table_indexes)
+    return '\n'.join(tables), '\n'.join(indexes)
+
+def create_schema(conn):
+    tables, indexes = backup_schema()
+    conn.executescript(tables)
+    conn.executescript(SCHEMA_ADDITIONS)
+    return indexes + INDEXES
+
+def create_indexes(conn, indexes):
+    conn.executescript(indexes)
+    conn.execute('ANALYZE')
+
+
+# Values in and out
+
+def _adapt_timedelta(value):
+    seconds = int(value.total_seconds())
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(timedelta, _adapt_timedelta)
+
+_CENTS = Decimal('0.01')
+
+def _convert_decimal(raw):
+    return Decimal(raw.decode()).quantize(_CENTS)
+
+def _convert_timestamp(raw):
+    return datetime.fromisoformat(raw.decode())
+
+def _convert_time(raw):
+    hours, minutes, seconds = raw.decode().split(':')
+    return timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds))
+
+sqlite3.register_converter('decimal', _convert_decimal)
+sqlite3.register_converter('timestamp', _convert_timestamp)
+sqlite3.register_converter('datetime', _convert_timestamp)
+sqlite3.register_converter('date', lambda raw: date.fromisoformat(raw.decode()))
+sqlite3.register_converter('time', _convert_time)
+
+# Aggregates like MAX(updated_at) lose the declared type; MySQL would still
+# hand back a datetime
+_TIMESTAMP_TEXT = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?$')
+
+def _mysql_value(value):
+    if isinstance(value, str) and _TIMESTAMP_TEXT.match(value):
+        return datetime.fromisoformat(value)
+    return value
+
+
+# SQL dialect
+
+_REWRITES = [
+    (re.compile(r'\bJSON_ARRAYAGG\(', re.I), 'json_group_array('),
+    (re.compile(r'\bGREATEST\(', re.I), 'max('),
+    (re.compile(r'\bLEAST\(', re.I), 'min('),
+    (re.compile(r'\bIF\(', re.I), 'iif('),
+    (re.compile(r'\bCURRENT_TIMESTAMP\(\d\)', re.I), "strftime('%Y-%m-%d %H:%M:%f', 'now')"),
+    (re.compile(r'\s+FOR UPDATE\b', re.I), ''),
+    (re.compile(r'\bINSERT IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\bNOW\(\) ([+-]) INTERVAL (\?|\d+) SECOND\b', re.I),
+     r"datetime(NOW(), '\1' || \2 || ' seconds')"),
+]
+
+@lru_cache(maxsize=1024)
+def translate(sql, has_params):
+    if has_params:
+        # mysql-connector only does %-formatting when there are parameters
+        sql = re.sub(r'%\((\w+)\)s', r':\1', sql).replace('%s', '?').replace('%%', '%')
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+class _BitXor:
+    def __init__(self):
+        self.value = 0
+
+    def step(self, value):
+        if value is not None:
+            self.value ^= int(value)
+
+    def finalize(self):
+        return self.value
+
+def _concat_ws(separator, *values):
+    return separator.join(str(v) for v in values if v is not None)
+
+
+class Cursor:
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._raw = conn._raw.cursor()
+        self.dictionary = dictionary
+        self._rows = []
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self.description or ())
+
+    @property
+    def with_rows(self):
+        return self.description is not None
+
+    def execute(self, operation, params=None, multi=False):
+        if isinstance(params, dict):
+            args = params
+        else:
+            args = tuple(params) if params is not None else ()
+        self._conn._last_insert_id = None
+        try:
+            self._raw.execute(translate(operation, params is not None), args)
+        except sqlite3.IntegrityError as e:
+            # The app tells duplicate keys apart by mysql-connector's errno
+            errno = errorcode.ER_DUP_ENTRY if 'UNIQUE' in str(e) else None
+            raise mysql.connector.IntegrityError(msg=str(e), errno=errno) from e
+        self._conn.in_transaction = self._conn._raw.in_transaction
+        self.description = self._raw.description
+        self._rows = self._raw.fetchall() if self.description is not None else []
+        self._conn.unread_result = False
+        self.rowcount = len(self._rows) if self.description is not None else self._raw.rowcount
+        # LAST_INSERT_ID(expr) sets lastrowid, like MySQL; other statements
+        # that insert nothing report 0
+        if self._conn._last_insert_id is not None:
+            self.lastrowid = self._conn._last_insert_id
+        elif operation.lstrip().upper().startswith(('INSERT', 'REPLACE')):
+            self.lastrowid = self._raw.lastrowid
+        else:
+            self.lastrowid = 0
+
+    def executemany(self, operation, seq_params):
+        seq_params = [tuple(p) for p in seq_params]
+        if not seq_params:
+            return
+        self._raw.executemany(translate(operation, True), seq_params)
+        self._conn.in_transaction = self._conn._raw.in_transaction
+        self.description = None
+        self._rows = []
+        self.rowcount = self._raw.rowcount
+        self.lastrowid = self._raw.lastrowid
+
+    def _shape(self, row):
+        row = tuple(_mysql_value(v) for v in row)
+        if self.dictionary:
+            return dict(zip(self.column_names, row))
+        return row
+
+    def fetchone(self):
+        if not self._rows:
+            return None
+        return self._shape(self._rows.pop(0))
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return [self._shape(row) for row in rows]
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return [self._shape(row) for row in rows]
+
+    def __iter__(self):
+        while self._rows:
+            yield self.fetchone()
+
+    def close(self):
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Connection:
+    # The parts of MySQLConnection the app and the pool use
+    def __init__(self, path):
+        self._raw = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                    detect_types=sqlite3.PARSE_DECLTYPES)
+        self._raw.execute('PRAGMA journal_mode=WAL')
+        self._raw.execute('PRAGMA synchronous=NORMAL')
+        self._last_insert_id = None
+        self.in_transaction = False
+        self.unread_result = False
+        self._closed = False
+        self._register_functions()
+
+    def _register_functions(self):
+        raw = self._raw
+        raw.create_function('NOW', 0, lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        raw.create_function('CURDATE', 0, lambda: date.today().isoformat())
+        raw.create_function('CRC32', 1, lambda v: None if v is None else zlib.crc32(str(v).encode()))
+        raw.create_function('CONCAT_WS', -1, _concat_ws)
+        raw.create_function('UNIX_TIMESTAMP', 0, lambda: int(datetime.now().timestamp()))
+        raw.create_function('LAST_INSERT_ID', 1, self._set_last_insert_id)
+        raw.create_aggregate('BIT_XOR', 1, _BitXor)
+
+    def _set_last_insert_id(self, value):
+        self._last_insert_id = value
+        return value
+
+    def cursor(self, dictionary=False, buffered=None, **kwargs):
+        return Cursor(self, dictionary=dictionary)
+
+    def commit(self):
+        self._raw.commit()
+        self.in_transaction = False
+
+    def rollback(self):
+        self._raw.rollback()
+        self.in_transaction = False
+
+    def start_transaction(self, **kwargs):
+        self._raw.execute('BEGIN')
+        self.in_transaction = True
+
+    def consume_results(self):
+        self.unread_result = False
+
+    def is_connected(self):
+        return not self._closed
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if self._closed:
+            raise sqlite3.ProgrammingError('Connection is closed')
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._raw.close()
+
+
+def connector(path):
+    # Drop-in for database.connection._connect
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'{path} does not exist; build it with python -m benchmarks.dataset')
+    return lambda: Connection(path)
+
+def install(path):
+    import database.connection
+    database.connection._connect = connector(path)
@@ -0,0 +1,131 @@
+import os
+import random
+import mysql.connector
+from mysql.connector import errorcode
+from database.connection import create_connection
+
+class IdempotencyController:
+    # Keys live in MySQL so a retry is recognised whichever gunicorn worker
+    # it lands on. The primary key doubles as the lock: the first request
+    # inserts the row, a concurrent duplicate hits ER_DUP_ENTRY and is told
+    # to retry instead of creating a second order.
+    def __init__(self):
+        self.ttl = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+        # A 'processing' row older than this belongs to a request that died
+        # mid-flight and may be taken over.
+        self.lease = int(os.getenv('IDEMPOTENCY_LEASE_SECONDS', '60'))
+        self.purge_probability = 0.01
+
+    def begin(self, user_id, key, request_hash):
+        conn = create_connection()
+        if not conn:
+            raise RuntimeError('Database connection failed')
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("""
+                    INSERT INTO idempotency_keys (
+                        user_id, idempotency_key, request_hash, expires_at
+                    ) VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)
+                """, (user_id, key, request_hash, self.ttl))
+                conn.commit()
+                self._maybe_purge(cursor, conn)
+                return {'state': 'new'}
+            except mysql.connector.IntegrityError as err:
+                conn.rollback()
+                if err.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+
+            cursor.execute("""
+                SELECT request_hash, status, response_status, response_body,
+                    (expires_at < NOW() OR
+                     (status = 'processing' AND created_at < NOW() - INTERVAL %s SECOND)) AS stale
+                FROM idempotency_keys
+                WHERE user_id = %s AND idempotency_key = %s
+            """, (self.lease, user_id, key))
+            row = cursor.fetchone()
+
+            if not row:
+                return {'state': 'in_progress'}
+
+            if row['stale']:
+                cursor.execute("""
+                    UPDATE idempotency_keys
+                    SET request_hash = %s, status = 'processing',
+                        response_status = NULL, response_body = NULL,
+                        created_at = NOW(), expires_at = NOW() + INTERVAL %s SECOND
+                    WHERE user_id = %s AND idempotency_key = %s AND (
+                        expires_at < NOW() OR
+                        (status = 'processing' AND created_at < NOW() - INTERVAL %s SECOND)
+                    )
+                """, (request_hash, self.ttl, user_id, key, self.lease))
+                taken = cursor.rowcount == 1
+                conn.commit()
+                return {'state': 'new' if taken else 'in_progress'}
+
+            if row['request_hash'] != request_hash:
+                return {'state': 'mismatch'}
+
+            if row['status'] == 'completed':
+                return {
+                    'state': 'replay',
+                    'status': row['response_status'],
+                    'body': row['response_body']
+                }
+
+            return {'state': 'in_progress'}
+        finally:
+            if conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def complete(self, user_id, key, status, body):
+        conn = create_connection()
+        if not conn:
+            return False
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET status = 'completed', response_status = %s, response_body = %s
+                WHERE user_id = %s AND idempotency_key = %s
+            """, (status, body, user_id, key))
+            conn.commit()
+            return True
+        finally:
+            if conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def abandon(self, user_id, key):
+        # Failed requests release their key so the client can retry
+        conn = create_connection()
+        if not conn:
+            return False
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM idempotency_keys
+                WHERE user_id = %s AND idempotency_key = %s AND status = 'processing'
+            """, (user_id, key))
+            conn.commit()
+            return True
+        finally:
+            if conn.is_connected():
+                cursor.close()
+                conn.close()
+
+    def _maybe_purge(self, cursor, conn):
+        # Expired keys are cleaned up a few at a time, piggybacking on
+        # roughly one in a hundred new keys.
+        if random.random() >= self.purge_probability:
+            return
+        try:
+            cursor.execute("DELETE FROM idempotency_keys WHERE expires_at < NOW() LIMIT 500")
+            conn.commit()
+        except mysql.connector.Error as err:
+            conn.rollback()
+            print(f"Error purging idempotency keys: {err}")
@@ -1,11 +1,156 @@
 from database.connection import create_connection
+from models.kiloPriceModel import kilo_price_index
+from models import orderStatusModel as order_status
 import json
+import logging
+
+logger = logging.getLogger('labaride.transactions')
 
 class TransactionController:
     def __init__(self):
         self.connection = None
 
+    TRANSACTION_INSERT = """
+        INSERT INTO transactions (
+            user_id, shop_id, user_name, user_email, user_phone,
+            services, kilo_amount, subtotal, delivery_fee,
+            voucher_discount, total_amount, delivery_type,
+            zone, street, barangay, building,
+            scheduled_date, scheduled_time, payment_method,
+            notes, status
+        ) VALUES (
+            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+            'Pending'
+        )
+    """
+
+    ITEMS_INSERT = """
+        INSERT INTO transaction_items (
+            transaction_id, item_name, quantity
+        ) VALUES (%s, %s, %s)
+    """
+
+    MAX_BULK_ORDERS = 100
+
+    # Keys _insert_transaction reads with data[...]
+    REQUIRED_FIELDS = (
+        'shop_id', 'services', 'subtotal', 'delivery_fee', 'total_amount',
+        'delivery_type', 'zone', 'street', 'barangay', 'building',
+        'scheduled_date', 'scheduled_time'
+    )
+    NUMERIC_FIELDS = ('kilo_amount', 'subtotal', 'delivery_fee', 'voucher_discount', 'total_amount')
+
+    def _order_error(self, data):
+        # Shape check for one order; returns a message or None
+        if not isinstance(data, dict):
+            return 'must be an object'
+        missing = [field for field in self.REQUIRED_FIELDS if data.get(field) in (None, '')]
+        if missing:
+            return f"missing {', '.join(missing)}"
+        if not str(data['shop_id']).isdigit():
+            return 'shop_id must be an integer'
+        services = data['services']
+        if not isinstance(services, str) and not (
+                isinstance(services, list) and all(isinstance(name, str) for name in services)):
+            return 'services must be a list of names'
+        for field in self.NUMERIC_FIELDS:
+            if data.get(field) is None:
+                continue
+            try:
+                float(data[field])
+            except (TypeError, ValueError):
+                return f'{field} must be a number'
+        items = data.get('selected_items')
+        if items:
+            if isinstance(items, str):
+                try:
+                    items = json.loads(items)
+                except ValueError:
+                    return 'selected_items is not valid JSON'
+            if not isinstance(items, dict) or not all(
+                    isinstance(name, str) and isinstance(quantity, (int, float))
+                    and not isinstance(quantity, bool) and float(quantity).is_integer()
+                    for name, quantity in items.items()):
+                return 'selected_items must map item names to whole quantities'
+        return None
+
+    def validate_orders(self, orders):
+        # Everything that can be checked without the database, so a bad
+        # element is a 400 before any transaction is opened
+        if not isinstance(orders, list) or not orders:
+            return {'status': 400, 'message': 'transactions must be a non-empty list'}
+        if len(orders) > self.MAX_BULK_ORDERS:
+            return {'status': 400, 'message': f'At most {self.MAX_BULK_ORDERS} transactions per request'}
+        for index, data in enumerate(orders):
+            error = self._order_error(data)
+            if error:
+                return {'status': 400, 'message': f'Transaction {index}: {error}'}
+        return None
+
+    def _check_kilo_range(self, data):
+        # Served from the in-memory tier index, no DB round trip
+        if 'kilo_amount' in data and float(data['kilo_amount']) > 0:
+            return kilo_price_index.lookup(data['shop_id'], data['kilo_amount']) is not None
+        return True
+
+    def _insert_transaction(self, cursor, user_id, user_data, data):
+        # Handle services as JSON array
+        services = json.dumps(data['services']) if isinstance(data['services'], list) else data['services']
+
+        values = (
+            user_id,
+            data['shop_id'],
+            user_data['name'],
+            user_data['email'],
+            user_data.get('phone', ''),
+            services,
+            data.get('kilo_amount', 0),
+            data['subtotal'],
+            data['delivery_fee'],
+            data.get('voucher_discount', 0),
+            data['total_amount'],
+            data['delivery_type'],
+            data['zone'],
+            data['street'],
+            data['barangay'],
+            data['building'],
+            data['scheduled_date'],
+            data['scheduled_time'],
+            data.get('payment_method', 'Cash on Delivery'),
+            data.get('notes', '')
+        )
+        
+        cursor.execute(self.TRANSACTION_INSERT, values)
+        return cursor.lastrowid
+
+    def _item_rows(self, transaction_id, data):
+        if not data.get('selected_items'):
+            return []
+        items_data = json.loads(data['selected_items']) if isinstance(data['selected_items'], str) else data['selected_items']
+        return [
+            (transaction_id, item_name, quantity)
+            for item_name, quantity in items_data.items()
+            if quantity > 0
+        ]
+
+    def _insert_items(self, cursor, item_rows):
+        # executemany() on a plain INSERT ... VALUES is rewritten by the
+        # connector into one multi-row INSERT, so the whole basket costs a
+        # single round trip.
+        if item_rows:
+            cursor.executemany(self.ITEMS_INSERT, item_rows)
+
     def create_transaction(self, user_id, data):
+        # Before taking a connection: a tier cache miss loads on a pooled
+        # connection of its own, and holding one while waiting for another
+        # can drain the pool under a burst of orders
+        try:
+            if not self._check_kilo_range(data):
+                return {'status': 400, 'message': 'Invalid kilo range'}
+        except (TypeError, ValueError):
+            return {'status': 400, 'message': 'Invalid kilo amount'}
+
         conn = create_connection()
         try:
             cursor = conn.cursor(dictionary=True)
@@ -18,86 +163,8 @@ class TransactionController:
             if not user_data:
                 return {'status': 404, 'message': 'User not found'}
 
-            # Validate kilo amount if present
-            if 'kilo_amount' in data and float(data['kilo_amount']) > 0:
-                price_query = """
-                    SELECT price_per_kilo 
-                    FROM kilo_prices 
-                    WHERE shop_id = %s AND 
-                    min_kilo <= %s AND 
-                    max_kilo >= %s
-                    LIMIT 1
-                """
-                cursor.execute(price_query, (
-                    data['shop_id'], 
-                    data['kilo_amount'],
-                    data['kilo_amount']
-                ))
-                price_data = cursor.fetchone()
-                
-                if not price_data:
-                    return {'status': 400, 'message': 'Invalid kilo range'}
-
-            # Handle services as JSON array
-            services = json.dumps(data['services']) if isinstance(data['services'], list) else data['services']
-
-            # Insert transaction
-            query = """
-                INSERT INTO transactions (
-                    user_id, shop_id, user_name, user_email, user_phone,
-                    services, kilo_amount, subtotal, delivery_fee,
-                    voucher_discount, total_amount, delivery_type,
-                    zone, street, barangay, building,
-                    scheduled_date, scheduled_time, payment_method,
-                    notes, status
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    'Pending'
-                )
-            """
-            
-            values = (
-                user_id,
-                data['shop_id'],
-                user_data['name'],
-                user_data['email'],
-                user_data.get('phone', ''),
-                services,
-                data.get('kilo_amount', 0),
-                data['subtotal'],
-                data['delivery_fee'],
-                data.get('voucher_discount', 0),
-                data['total_amount'],
-                data['delivery_type'],
-                data['zone'],
-                data['street'],
-                data['barangay'],
-                data['building'],
-                data['scheduled_date'],
-                data['scheduled_time'],
-                data.get('payment_method', 'Cash on Delivery'),
-                data.get('notes', '')
-            )
-            
-            cursor.execute(query, values)
-            transaction_id = cursor.lastrowid
-            
-            # Handle items insertion
-            if 'selected_items' in data and data['selected_items']:
-                items_data = json.loads(data['selected_items']) if isinstance(data['selected_items'], str) else data['selected_items']
-                items_query = """
-                    INSERT INTO transaction_items (
-                        transaction_id, item_name, quantity
-                    ) VALUES (%s, %s, %s)
-                """
-                for item_name, quantity in items_data.items():
-                    if quantity > 0:
-                        cursor.execute(items_query, (
-                            transaction_id,
-                            item_name,
-                            quantity
-                        ))
+            transaction_id = self._insert_transaction(cursor, user_id, user_data, data)
+            self._insert_items(cursor, self._item_rows(transaction_id, data))
             
             conn.commit()
             return {
@@ -116,13 +183,59 @@ class TransactionController:
                 cursor.close()
                 conn.close()
 
+    def create_transactions(self, user_id, orders):
+        # Bulk variant for corporate accounts: every order is validated up
+        # front and all of them are committed together or not at all.
+        error = self.validate_orders(orders)
+        if error:
+            return error
+
+        for index, data in enumerate(orders):
+            if not self._check_kilo_range(data):
+                return {'status': 400, 'message': f'Transaction {index}: Invalid kilo range'}
+
+        conn = create_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+
+            cursor.execute("SELECT name, email, phone FROM users WHERE id = %s", (user_id,))
+            user_data = cursor.fetchone()
+
+            if not user_data:
+                return {'status': 404, 'message': 'User not found'}
+
+            transaction_ids = []
+            item_rows = []
+            for data in orders:
+                transaction_id = self._insert_transaction(cursor, user_id, user_data, data)
+                transaction_ids.append(transaction_id)
+                item_rows.extend(self._item_rows(transaction_id, data))
+            self._insert_items(cursor, item_rows)
+
+            conn.commit()
+            return {
+                'status': 201,
+                'message': 'Transactions created successfully',
+                'transaction_ids': transaction_ids
+            }
+
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.exception("Error creating transactions for user %s", user_id)
+            return {'status': 500, 'message': str(e)}
+        finally:
+            if conn and conn.is_connected():
+                cursor.close()
+                conn.close()
+
     def get_transaction(self, transaction_id):
         conn = create_connection()
         try:
             cursor = conn.cursor(dictionary=True)
             
             query = """
-                SELECT t.*, k.price_per_kilo,
+                SELECT t.*,
                     (SELECT JSON_ARRAYAGG(
                         JSON_OBJECT(
                             'name', ti.item_name,
@@ -133,27 +246,10 @@ class TransactionController:
                     WHERE ti.transaction_id = t.id
                     ) as items
                 FROM transactions t
-                LEFT JOIN kilo_prices k ON 
-                    k.shop_id = t.shop_id AND
-                    k.min_kilo <= t.kilo_amount AND
-                    k.max_kilo >= t.kilo_amount
                 WHERE t.id = %s
             """
             cursor.execute(query, (transaction_id,))
             transaction = cursor.fetchone()
-            
-            if not transaction:
-                return {'status': 404, 'message': 'Transaction not found'}
-
-            # Parse services from JSON if it exists
-            if transaction.get('services'):
-                try:
-                    transaction['services'] = json.loads(transaction['services'])
-                except:
-                    pass
-
-            return {'status': 200, 'data': transaction}
-
         except Exception as e:
             print(f"Error getting transaction: {e}")
             return {'status': 500, 'message': str(e)}
@@ -162,40 +258,54 @@ class TransactionController:
                 cursor.close()
                 conn.close()
 
+        if not transaction:
+            return {'status': 404, 'message': 'Transaction not found'}
+
+        try:
+            # Tier price for the ordered weight, from the in-memory index.
+            # Looked up after the connection is back in the pool, since a
+            # cache miss loads the tiers on a connection of its own.
+            tier = kilo_price_index.lookup(transaction['shop_id'], transaction['kilo_amount'])
+        except Exception as e:
+            print(f"Error getting transaction: {e}")
+            return {'status': 500, 'message': str(e)}
+        transaction['price_per_kilo'] = tier['price_per_kilo'] if tier else None
+
+        # Parse services from JSON if it exists
+        if transaction.get('services'):
+            try:
+                transaction['services'] = json.loads(transaction['services'])
+            except:
+                pass
+
+        return {'status': 200, 'data': transaction}
+
     def update_transaction_status(self, transaction_id, status, notes=None):
+        try:
+            status = order_status.normalize(status)
+        except ValueError as e:
+            return {'status': 400, 'message': str(e)}
+
         conn = None
         try:
             conn = create_connection()
             cursor = conn.cursor(dictionary=True)
 
-            # Check if transaction exists and get user/shop IDs
-            cursor.execute("""
-                SELECT id, user_id, shop_id FROM transactions 
-                WHERE id = %s
-            """, (transaction_id,))
-            transaction = cursor.fetchone()
-            
-            if not transaction:
-                return {'status': 404, 'message': 'Transaction not found'}
-
-            update_query = """
-                UPDATE transactions 
-                SET status = %s{}
-                WHERE id = %s
-            """.format(", notes = %s" if notes else "")
-
-            values = [status, transaction_id]
-            if notes:
-                values.insert(1, notes)
-
-            cursor.execute(update_query, tuple(values))
+            # One conditional UPDATE: checks the transition, returns the
+            # user/shop IDs for the socket rooms
+            result = order_status.transition(
+                cursor, transaction_id, status,
+                assignments={'notes': notes} if notes else None
+            )
+            if result['status'] != 200:
+                return result
             conn.commit()
             
             return {
                 'status': 200,
                 'message': 'Status updated successfully',
-                'user_id': transaction['user_id'],
-                'shop_id': transaction['shop_id']
+                'user_id': result['user_id'],
+                'shop_id': result['shop_id']
             }
             
         except Exception as e:
@@ -213,38 +323,22 @@ class TransactionController:
         try:
             conn = create_connection()
             cursor = conn.cursor(dictionary=True)
-            
-            # Check if transaction exists
-            cursor.execute("""
-                SELECT id, user_id, shop_id, status 
-                FROM transactions 
-                WHERE id = %s
-            """, (transaction_id,))
-            transaction = cursor.fetchone()
-            
-            if not transaction:
-                return {'status': 404, 'message': 'Transaction not found'}
-            
-            if transaction['status'] == 'Cancelled':
+
+            result = order_status.transition(
+                cursor, transaction_id, order_status.CANCELLED,
+                assignments={'notes': f"Cancelled - {reason}: {notes}" if notes else f"Cancelled - {reason}"}
+            )
+            if result.get('current_status') == order_status.CANCELLED:
                 return {'status': 400, 'message': 'Transaction already cancelled'}
-            
-            # Update transaction status to Cancelled
-            cursor.execute("""
-                UPDATE transactions 
-                SET status = 'Cancelled', 
-                    notes = %s
-                WHERE id = %s
-            """, (
-                f"Cancelled - {reason}: {notes}" if notes else f"Cancelled - {reason}",
-                transaction_id
-            ))
+            if result['status'] != 200:
+                return result
             
             conn.commit()
             return {
                 'status': 200,
                 'message': 'Transaction cancelled successfully',
-                'user_id': transaction['user_id'],
-                'shop_id': transaction['shop_id']
+                'user_id': result['user_id'],
+                'shop_id': result['shop_id']
             }
                 
         except Exception as e:
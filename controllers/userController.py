@@ -1,10 +1,10 @@
 from models.userModel import User
 from database.connection import create_connection
-import bcrypt
 import mysql.connector
 from datetime import datetime, timedelta
 import jwt
 from flask import current_app
+from utils.hashing import password_hasher, HasherBusy
 
 class UserController:
     def __init__(self):
@@ -131,13 +131,11 @@ class UserController:
                 return {'status': 404, 'message': 'User not found'}
                 
             # Verify current password
-            if not bcrypt.checkpw(data['current_password'].encode('utf-8'), 
-                                user['password'].encode('utf-8')):
+            if not password_hasher.check(data['current_password'], user['password']):
                 return {'status': 401, 'message': 'Current password is incorrect'}
             
             # Hash new password
-            hashed_password = bcrypt.hashpw(data['new_password'].encode('utf-8'), 
-                                        bcrypt.gensalt())
+            hashed_password = password_hasher.hash(data['new_password'])
             
             # Update password
             query = "UPDATE users SET password = %s WHERE id = %s"
@@ -149,6 +147,8 @@ class UserController:
                 
             return {'status': 200, 'message': 'Password updated successfully'}
                     
+        except HasherBusy:
+            return {'status': 503, 'message': 'Server busy, please try again'}
         except mysql.connector.Error as err:
             print(f"Password update error: {err}")  # Debug logging
             return {'status': 500, 'message': f'Database error: {str(err)}'}
@@ -172,13 +172,11 @@ class UserController:
             if not user:
                 return {'status': 404, 'message': 'User not found'}
                 
-            if not bcrypt.checkpw(data['current_password'].encode('utf-8'), 
-                                user['password'].encode('utf-8')):
+            if not password_hasher.check(data['current_password'], user['password']):
                 return {'status': 401, 'message': 'Current password is incorrect'}
             
             # Hash new password
-            hashed_password = bcrypt.hashpw(data['new_password'].encode('utf-8'), 
-                                        bcrypt.gensalt())
+            hashed_password = password_hasher.hash(data['new_password'])
             
             # Update password
             query = "UPDATE users SET password = %s WHERE id = %s"
@@ -187,6 +185,8 @@ class UserController:
             
             return {'status': 200, 'message': 'Password updated successfully'}
                     
+        except HasherBusy:
+            return {'status': 503, 'message': 'Server busy, please try again'}
         except mysql.connector.Error as err:
             return {'status': 500, 'message': f'Database error: {str(err)}'}
         finally:
@@ -207,8 +207,7 @@ class UserController:
             if not user:
                 return {'status': 401, 'message': 'Invalid email or password'}
                 
-            if bcrypt.checkpw(credentials['password'].encode('utf-8'), 
-                            user['password'].encode('utf-8')):
+            if password_hasher.check(credentials['password'], user['password']):
                 # Generate proper JWT token
                 token = jwt.encode({
                     'user_id': user['id'],
@@ -231,6 +230,8 @@ class UserController:
             
             return {'status': 401, 'message': 'Invalid email or password'}
             
+        except HasherBusy:
+            return {'status': 503, 'message': 'Server busy, please try again'}
         except mysql.connector.Error as err:
             return {'status': 500, 'message': f'Database error: {str(err)}'}
         except Exception as e:
@@ -269,11 +270,8 @@ class UserController:
             if cursor.fetchone():
                 return {'status': 400, 'message': 'Email already exists'}
 
-            # Hash password with bcrypt
-            hashed_password = bcrypt.hashpw(
-                data['password'].encode('utf-8'), 
-                bcrypt.gensalt()
-            )
+            # Hash password with bcrypt (off the request thread)
+            hashed_password = password_hasher.hash(data['password'])
             
             # Clean input data
             name = data['name'].strip()
@@ -315,6 +313,8 @@ class UserController:
                 'token': token
             }
                 
+        except HasherBusy:
+            return {'status': 503, 'message': 'Server busy, please try again'}
         except mysql.connector.Error as err:
             print("Database Error:", str(err))  # Debug print
             return {'status': 500, 'message': f'Database error: {str(err)}'}
@@ -1,19 +1,85 @@
 import os
+import threading
+from contextlib import contextmanager
 import mysql.connector
 from mysql.connector import Error
+from database.pool import ConnectionPool
+from utils.green import is_patched
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_acquire_observers = []
+
+def _connect():
+    return mysql.connector.connect(
+        host=os.getenv('MYSQLHOST', 'localhost'),
+        user=os.getenv('MYSQLUSER', 'root'),
+        password=os.getenv('MYSQLPASSWORD', '1025'),
+        database=os.getenv('MYSQLDATABASE', 'LabaRide_DB'),
+        port=os.getenv('MYSQLPORT', '8080'),
+        # The C extension blocks the whole gevent hub during a query
+        use_pure=os.getenv('MYSQL_USE_PURE', '1' if is_patched() else '0') == '1',
+    )
+
+def get_pool():
+    global _pool, _pool_pid
+    # Sockets must never be shared across a fork, so every gunicorn worker
+    # builds its own pool the first time it needs one.
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(
+                    _connect,
+                    size=int(os.getenv('MYSQL_POOL_SIZE', '5')),
+                    max_overflow=int(os.getenv('MYSQL_POOL_MAX_OVERFLOW', '10')),
+                    timeout=float(os.getenv('MYSQL_POOL_TIMEOUT', '10')),
+                    idle_timeout=float(os.getenv('MYSQL_POOL_IDLE_TIMEOUT', '300')),
+                    pre_ping=os.getenv('MYSQL_POOL_PRE_PING', '1') == '1',
+                    leak_timeout=float(os.getenv('MYSQL_POOL_LEAK_TIMEOUT', '60')),
+                    track_stacks=os.getenv('MYSQL_POOL_TRACK_STACKS', '0') == '1',
+                )
+                for callback in _acquire_observers:
+                    _pool.add_observer(callback)
+                _pool_pid = os.getpid()
+    return _pool
+
+def add_acquire_observer(callback):
+    # callback(wait_seconds); kept across the per-worker pool rebuilds
+    with _pool_lock:
+        _acquire_observers.append(callback)
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.add_observer(callback)
+
+def pool_stats():
+    return get_pool().stats()
 
 def create_connection():
+    # Returns a pooled connection; calling close() on it hands it back to
+    # the pool instead of tearing down the socket.
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('MYSQLHOST', 'localhost'),
-            user=os.getenv('MYSQLUSER', 'root'),
-            password=os.getenv('MYSQLPASSWORD', '1025'),
-            database=os.getenv('MYSQLDATABASE', 'LabaRide_DB'),
-            port=os.getenv('MYSQLPORT', '8080'),
-        )
-        if connection.is_connected():
-            print("Successfully connected to MySQL database")
-            return connection
+        return get_pool().acquire()
     except Error as e:
         print(f"Error connecting to MySQL Database: {e}")
         return None
+
+@contextmanager
+def get_connection():
+    conn = get_pool().acquire()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def fetch_all(query, params=(), dictionary=True):
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=dictionary)
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+def fetch_one(query, params=(), dictionary=True):
+    rows = fetch_all(query, params, dictionary)
+    return rows[0] if rows else None
@@ -44,6 +44,7 @@ CREATE TABLE transactions (
     notes TEXT,
     status ENUM('Pending', 'Processing', 'Completed', 'Cancelled') DEFAULT 'Pending',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
     FOREIGN KEY (user_id) REFERENCES users(id),
     FOREIGN KEY (shop_id) REFERENCES shops(id)
 );
@@ -87,6 +88,133 @@ CREATE TABLE IF NOT EXISTS kilo_prices (
     UNIQUE KEY unique_range (shop_id, min_kilo, max_kilo)
 );
 
+-- Idempotency-Key records for order creation retries
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INT NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status ENUM('processing', 'completed') NOT NULL DEFAULT 'processing',
+    response_status SMALLINT,
+    response_body MEDIUMTEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, idempotency_key),
+    KEY idx_idempotency_expires (expires_at)
+);
+
+-- Keyset pagination indexes for /user_transactions and /shop_transactions
+CREATE INDEX idx_transactions_user_created ON transactions (user_id, created_at, id);
+CREATE INDEX idx_transactions_shop_created ON transactions (shop_id, created_at, id);
+
+-- Delta sync (/sync/transactions) walks (updated_at, id) per user or shop.
+-- Existing databases need the column first:
+--   ALTER TABLE transactions ADD COLUMN updated_at TIMESTAMP(3) NOT NULL
+--     DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3);
+CREATE INDEX idx_transactions_user_updated ON transactions (user_id, updated_at, id);
+CREATE INDEX idx_transactions_shop_updated ON transactions (shop_id, updated_at, id);
+
+-- Dashboard rollups for /shop/<id>/stats. The triggers below keep them in
+-- step with every insert, update and delete on transactions, whichever
+-- route made it. Cancelled orders only count in "cancelled" and in their
+-- status row, never in orders/revenue/kilos.
+CREATE TABLE IF NOT EXISTS shop_daily_stats (
+    shop_id INT NOT NULL,
+    day DATE NOT NULL,
+    orders INT NOT NULL DEFAULT 0,
+    cancelled INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    kilos DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (shop_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS shop_status_stats (
+    shop_id INT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    orders INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    kilos DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (shop_id, status)
+);
+
+DELIMITER $$
+
+-- Adds (p_sign = 1) or removes (p_sign = -1) one order's contribution
+CREATE PROCEDURE shop_stats_apply(
+    IN p_shop_id INT, IN p_day DATE, IN p_status VARCHAR(20),
+    IN p_total DECIMAL(10,2), IN p_kilo DECIMAL(10,2), IN p_sign INT
+)
+BEGIN
+    DECLARE counted INT;
+    SET p_status = COALESCE(p_status, 'Pending');
+    SET counted = IF(p_status = 'Cancelled', 0, 1);
+
+    INSERT INTO shop_daily_stats (shop_id, day, orders, cancelled, revenue, kilos)
+    VALUES (p_shop_id, p_day, p_sign * counted, p_sign * (1 - counted),
+            p_sign * counted * p_total, p_sign * counted * p_kilo)
+    ON DUPLICATE KEY UPDATE
+        orders = orders + VALUES(orders),
+        cancelled = cancelled + VALUES(cancelled),
+        revenue = revenue + VALUES(revenue),
+        kilos = kilos + VALUES(kilos);
+
+    INSERT INTO shop_status_stats (shop_id, status, orders, revenue, kilos)
+    VALUES (p_shop_id, p_status, p_sign, p_sign * p_total, p_sign * p_kilo)
+    ON DUPLICATE KEY UPDATE
+        orders = orders + VALUES(orders),
+        revenue = revenue + VALUES(revenue),
+        kilos = kilos + VALUES(kilos);
+END$$
+
+CREATE TRIGGER transactions_stats_insert AFTER INSERT ON transactions
+FOR EACH ROW
+BEGIN
+    CALL shop_stats_apply(NEW.shop_id, DATE(NEW.created_at), NEW.status,
+                          NEW.total_amount, NEW.kilo_amount, 1);
+END$$
+
+CREATE TRIGGER transactions_stats_update AFTER UPDATE ON transactions
+FOR EACH ROW
+BEGIN
+    -- updated_at changes on every write; only touch the rollups when a
+    -- column they depend on did
+    IF NOT (OLD.shop_id <=> NEW.shop_id AND OLD.created_at <=> NEW.created_at
+            AND OLD.status <=> NEW.status AND OLD.total_amount <=> NEW.total_amount
+            AND OLD.kilo_amount <=> NEW.kilo_amount) THEN
+        CALL shop_stats_apply(OLD.shop_id, DATE(OLD.created_at), OLD.status,
+                              OLD.total_amount, OLD.kilo_amount, -1);
+        CALL shop_stats_apply(NEW.shop_id, DATE(NEW.created_at), NEW.status,
+                              NEW.total_amount, NEW.kilo_amount, 1);
+    END IF;
+END$$
+
+CREATE TRIGGER transactions_stats_delete AFTER DELETE ON transactions
+FOR EACH ROW
+BEGIN
+    CALL shop_stats_apply(OLD.shop_id, DATE(OLD.created_at), OLD.status,
+                          OLD.total_amount, OLD.kilo_amount, -1);
+END$$
+
+DELIMITER ;
+
+-- Backfill for a database that already has orders (no-op on a fresh one).
+-- Run it right after creating the triggers, before traffic resumes.
+INSERT INTO shop_daily_stats (shop_id, day, orders, cancelled, revenue, kilos)
+SELECT shop_id, DATE(created_at),
+       SUM(status <> 'Cancelled'), SUM(status = 'Cancelled'),
+       SUM(IF(status <> 'Cancelled', total_amount, 0)),
+       SUM(IF(status <> 'Cancelled', kilo_amount, 0))
+FROM transactions
+GROUP BY shop_id, DATE(created_at)
+ON DUPLICATE KEY UPDATE
+    orders = VALUES(orders), cancelled = VALUES(cancelled),
+    revenue = VALUES(revenue), kilos = VALUES(kilos);
+
+INSERT INTO shop_status_stats (shop_id, status, orders, revenue, kilos)
+SELECT shop_id, COALESCE(status, 'Pending'), COUNT(*), SUM(total_amount), SUM(kilo_amount)
+FROM transactions
+GROUP BY shop_id, COALESCE(status, 'Pending')
+ON DUPLICATE KEY UPDATE
+    orders = VALUES(orders), revenue = VALUES(revenue), kilos = VALUES(kilos);
 
 select * from users;
 select * from shops;
@@ -0,0 +1,204 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from flask import g, request
+
+logger = logging.getLogger('labaride.sql')
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '10'))
+# Fingerprints kept for /api/debug/queries; the least used are dropped
+MAX_FINGERPRINTS = int(os.getenv('SQL_MAX_FINGERPRINTS', '500'))
+
+_COMMENT = re.compile(r'/\*(?!\+).*?\*/|--[^\n]*', re.S)
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_VALUES_LIST = re.compile(r'(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+')
+_SPACE = re.compile(r'\s+')
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    # Same statement shape -> same fingerprint, whatever the parameters:
+    # literals and placeholders become ?, IN lists and multi-row VALUES
+    # collapse, whitespace and comments go away. Optimizer hints stay.
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _COMMENT.sub(' ', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub(r'\1, ...', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class RequestQueries:
+    # What one request did against the database
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest = None
+        self.by_fingerprint = Counter()
+
+    def add(self, fp, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.by_fingerprint[fp] += 1
+        if ms > self.slowest_ms:
+            self.slowest_ms = ms
+            self.slowest = fp
+
+    def repeated(self, threshold=None):
+        # Fingerprints run more than threshold times: almost always a query
+        # inside a loop that should have been a join or an IN (...)
+        threshold = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [(fp, n) for fp, n in self.by_fingerprint.most_common() if n > threshold]
+
+
+class QueryStats:
+    # Process-wide totals per fingerprint, plus the per-request collector
+    # for whatever request is running in the current thread/greenlet
+    def __init__(self, max_fingerprints=MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self._current = ContextVar('request_queries', default=None)
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._counts = Counter()
+
+    def begin(self, label):
+        return self._current.set(RequestQueries(label))
+
+    def current(self):
+        return self._current.get()
+
+    def end(self, token):
+        queries = self._current.get()
+        self._current.reset(token)
+        if queries is None:
+            return None
+        repeated = queries.repeated()
+        for fp, n in repeated:
+            logger.warning('N+1 suspect in %s: %d x %s', queries.label, n, fp)
+        if repeated:
+            with self._lock:
+                self._counts['n_plus_one'] += 1
+        return queries
+
+    def record(self, sql, ms):
+        fp = fingerprint(sql)
+        queries = self._current.get()
+        if queries is not None:
+            queries.add(fp, ms)
+        if ms >= SLOW_QUERY_MS:
+            logger.warning('slow query %.1fms in %s: %s', ms,
+                           queries.label if queries is not None else '-', fp)
+        with self._lock:
+            self._counts['queries'] += 1
+            if ms >= SLOW_QUERY_MS:
+                self._counts['slow'] += 1
+            entry = self._totals.get(fp)
+            if entry is None:
+                if len(self._totals) >= self.max_fingerprints:
+                    self._evict()
+                entry = self._totals[fp] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += ms
+            if ms > entry[2]:
+                entry[2] = ms
+
+    def _evict(self):
+        # Drop the least executed half; called with the lock held
+        keep = sorted(self._totals.items(), key=lambda item: item[1][0], reverse=True)
+        self._totals = dict(keep[:self.max_fingerprints // 2])
+
+    def stats(self, top=20):
+        with self._lock:
+            totals = sorted(self._totals.items(), key=lambda item: item[1][1], reverse=True)[:top]
+            return {
+                'slow_query_ms': SLOW_QUERY_MS,
+                'n_plus_one_threshold': N_PLUS_ONE_THRESHOLD,
+                'queries': self._counts['queries'],
+                'slow_queries': self._counts['slow'],
+                'n_plus_one_requests': self._counts['n_plus_one'],
+                'fingerprints': len(self._totals),
+                'top': [{
+                    'fingerprint': fp,
+                    'count': count,
+                    'total_ms': round(total_ms, 1),
+                    'avg_ms': round(total_ms / count, 2),
+                    'max_ms': round(max_ms, 1),
+                } for fp, (count, total_ms, max_ms) in totals],
+            }
+
+
+query_stats = QueryStats()
+
+
+class InstrumentedCursor:
+    # Times execute()/executemany() and reports them to query_stats;
+    # everything else goes straight to the driver cursor
+    def __init__(self, raw, stats=query_stats):
+        self._raw = raw
+        self._stats = stats
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._raw.execute(operation, params, *args, **kwargs)
+        finally:
+            self._stats.record(operation, (time.perf_counter() - started) * 1000)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._raw.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._stats.record(operation, (time.perf_counter() - started) * 1000)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._raw.close()
+
+
+def init_query_stats(app):
+    # Per-request query count, DB time and slowest statement. The X-DB-*
+    # headers are only sent in debug mode or with SQL_DEBUG_HEADERS=1
+    app.config.setdefault('SQL_DEBUG_HEADERS', os.getenv('SQL_DEBUG_HEADERS', '0') == '1')
+
+    @app.before_request
+    def begin_query_stats():
+        g._query_stats_token = query_stats.begin(f'{request.method} {request.path}')
+
+    @app.after_request
+    def end_query_stats(response):
+        token = g.pop('_query_stats_token', None)
+        if token is None:
+            return response
+        queries = query_stats.end(token)
+        if queries is not None and (app.debug or app.config['SQL_DEBUG_HEADERS']):
+            response.headers['X-DB-Queries'] = str(queries.count)
+            response.headers['X-DB-Time-Ms'] = f'{queries.total_ms:.1f}'
+            if queries.slowest is not None:
+                response.headers['X-DB-Slowest-Ms'] = f'{queries.slowest_ms:.1f}'
+                response.headers['X-DB-Slowest'] = queries.slowest[:200]
+            repeated = queries.repeated()
+            if repeated:
+                response.headers['X-DB-N-Plus-One'] = f'{repeated[0][1]}x {repeated[0][0][:200]}'
+        return response
@@ -0,0 +1,39 @@
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        limit = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
+
+def encode_cursor(timestamp, row_id):
+    # Opaque to clients: base64 of the (timestamp, id) keyset position.
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')
+    raw = json.dumps([timestamp, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f'), int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+def keyset_page(rows, limit, time_key='created_at', id_key='id'):
+    # Queries fetch limit + 1 rows so the extra one tells us whether another
+    # page exists without a COUNT(*).
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[time_key], last[id_key])
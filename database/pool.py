@@ -0,0 +1,269 @@
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from mysql.connector import Error
+from database.instrumentation import InstrumentedCursor
+
+
+class PoolError(Error):
+    pass
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class PooledConnection:
+    # Thin proxy handed out by the pool. Everything is delegated to the real
+    # connection except close(), which gives the connection back instead.
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+        self.checked_out_at = time.monotonic()
+        self.checkout_stack = None
+        self._leak_reported = False
+
+    def __getattr__(self, name):
+        if self._released:
+            raise PoolError('Connection was already returned to the pool')
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        if self._released:
+            raise PoolError('Connection was already returned to the pool')
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs))
+
+    def is_connected(self):
+        if self._released:
+            return False
+        return self._raw.is_connected()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # A proxy garbage collected while still checked out is a leak; log it
+        # and make sure the slot is not lost forever.
+        if not getattr(self, '_released', True):
+            self._pool._report_leak(self, collected=True)
+            self.close()
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=5, max_overflow=10, timeout=10.0,
+                 idle_timeout=300.0, pre_ping=True, leak_timeout=60.0,
+                 track_stacks=False):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.leak_timeout = leak_timeout
+        self.track_stacks = track_stacks
+
+        self._lock = threading.Condition()
+        # (raw connection, time it was returned) - most recently used last
+        self._idle = deque()
+        # Weak so that a proxy dropped without close() can still be collected
+        # and reported by PooledConnection.__del__.
+        self._checked_out = weakref.WeakSet()
+        self._total = 0
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'acquired': 0,
+            'released': 0,
+            'timeouts': 0,
+            'ping_failures': 0,
+            'idle_evictions': 0,
+            'leaks': 0,
+            'wait_time_total': 0.0,
+        }
+        self._observers = []
+
+    def add_observer(self, callback):
+        # callback(wait_seconds) after every successful acquire
+        self._observers.append(callback)
+
+    # Checkout / checkin
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        raw = None
+        expired = []
+        try:
+            with self._lock:
+                expired = self._evict_idle()
+                self._check_leaks()
+                while True:
+                    if self._idle:
+                        raw, _ = self._idle.pop()
+                        break
+                    if self._total < self.size + self.max_overflow:
+                        self._total += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'Timed out after {self.timeout}s waiting for a '
+                            f'connection ({self._total} in use)'
+                        )
+                    self._lock.wait(remaining)
+        finally:
+            for stale in expired:
+                self._close_raw(stale)
+
+        try:
+            if raw is not None and not self._is_healthy(raw):
+                self._discard(raw, count=False)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+                with self._lock:
+                    self._stats['created'] += 1
+        except Exception:
+            with self._lock:
+                self._total -= 1
+                self._lock.notify()
+            raise
+
+        conn = PooledConnection(self, raw)
+        if self.track_stacks:
+            conn.checkout_stack = ''.join(traceback.format_stack(limit=8)[:-2])
+        with self._lock:
+            self._checked_out.add(conn)
+            self._stats['acquired'] += 1
+            waited = time.monotonic() - started
+            self._stats['wait_time_total'] += waited
+        for callback in self._observers:
+            callback(waited)
+        return conn
+
+    def _release(self, conn):
+        raw = conn._raw
+        reusable = True
+        try:
+            if raw.is_connected():
+                # Never hand a half-finished transaction or unread result to
+                # the next caller.
+                if raw.unread_result:
+                    raw.consume_results()
+                if raw.in_transaction:
+                    raw.rollback()
+            else:
+                reusable = False
+        except Exception:
+            reusable = False
+
+        with self._lock:
+            self._checked_out.discard(conn)
+            self._stats['released'] += 1
+            if reusable and len(self._idle) < self.size:
+                self._idle.append((raw, time.monotonic()))
+                raw = None
+            else:
+                self._total -= 1
+            self._lock.notify()
+
+        if raw is not None:
+            self._close_raw(raw)
+
+    # Health and housekeeping
+
+    def _is_healthy(self, raw):
+        if not self.pre_ping:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._lock:
+                self._stats['ping_failures'] += 1
+            return False
+
+    def _discard(self, raw, count=True):
+        # Drops a broken idle connection. The slot stays reserved for the
+        # caller when count is False, since it is about to reconnect.
+        self._close_raw(raw)
+        if count:
+            with self._lock:
+                self._total -= 1
+                self._lock.notify()
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._stats['closed'] += 1
+
+    def _evict_idle(self):
+        # Caller holds the lock. Oldest idle connections sit at the left; the
+        # expired ones are returned so they can be closed outside the lock.
+        expired = []
+        if not self.idle_timeout:
+            return expired
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            raw, _ = self._idle.popleft()
+            self._total -= 1
+            self._stats['idle_evictions'] += 1
+            expired.append(raw)
+        return expired
+
+    def _check_leaks(self):
+        # Caller holds the lock.
+        if not self.leak_timeout:
+            return
+        now = time.monotonic()
+        for conn in list(self._checked_out):
+            if now - conn.checked_out_at > self.leak_timeout and not conn._leak_reported:
+                conn._leak_reported = True
+                self._report_leak(conn)
+
+    def _report_leak(self, conn, collected=False):
+        self._stats['leaks'] += 1
+        held = time.monotonic() - conn.checked_out_at
+        if collected:
+            print(f"Pool leak: connection garbage collected without close() after {held:.1f}s")
+        else:
+            print(f"Pool leak: connection checked out for {held:.1f}s without being returned")
+        if conn.checkout_stack:
+            print(conn.checkout_stack)
+
+    def dispose(self):
+        with self._lock:
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._total -= len(idle)
+        for raw in idle:
+            self._close_raw(raw)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': len(self._checked_out),
+            })
+        acquired = stats['acquired']
+        stats['avg_wait_ms'] = round(stats.pop('wait_time_total') * 1000 / acquired, 3) if acquired else 0.0
+        return stats
@@ -0,0 +1,34 @@
+class FieldSet:
+    # Whitelist of what a list endpoint may return for ?fields=. columns
+    # maps each public field name to its SQL expression; profiles are named
+    # groups ("summary", "detail") that can be mixed with single fields.
+    # Required fields (keyset cursors need them) are always selected.
+    def __init__(self, columns, profiles, required=('id',)):
+        self.columns = columns
+        self.profiles = profiles
+        self.required = tuple(required)
+
+    def parse(self, value):
+        # None when the parameter is absent, so the endpoint keeps its
+        # default select list
+        if value is None:
+            return None
+        names = list(self.required)
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if part in self.profiles:
+                names.extend(self.profiles[part])
+            elif part in self.columns:
+                names.append(part)
+            else:
+                raise ValueError(f'Unknown field: {part}')
+        return list(dict.fromkeys(names))
+
+    def select_list(self, names):
+        return ', '.join(f'{self.columns[name]} AS {name}' for name in names)
+
+    def uses(self, names, prefix):
+        # Whether any selected expression reads from the given table alias
+        return any(self.columns[name].startswith(prefix) for name in names)
@@ -0,0 +1,28 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# One process per core is enough; each gevent worker multiplexes thousands
+# of sockets. With more than one worker set SOCKETIO_MESSAGE_QUEUE and use
+# sticky sessions at the balancer (see utils/realtime.py).
+import os
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+worker_class = 'gevent'
+# Concurrent sockets per worker; gunicorn's default of 1000 is far too low
+# for long-lived Socket.IO connections
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '10000'))
+# With async workers this is only the worker heartbeat; long-lived
+# websockets are not cut off by it
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+keepalive = 5
+graceful_timeout = 30
+
+raw_env = ['SOCKETIO_ASYNC_MODE=gevent']
+
+
+def post_worker_init(worker):
+    # Start the cache invalidation listener as soon as the worker is up
+    # (after gevent has patched it), not on its first request; with
+    # --preload the one started at import belongs to the master
+    from utils.invalidation import invalidation_bus
+    invalidation_bus.ensure_started()
@@ -0,0 +1,78 @@
+import os
+from bisect import bisect_right
+from database.connection import create_connection
+from utils.cache import TTLCache
+from utils.invalidation import invalidation_bus
+
+class KiloPriceIndex:
+    # Per-shop kilo price tiers, sorted by min_kilo so a lookup is a binary
+    # search instead of a range scan on kilo_prices. Tiers are loaded the
+    # first time a shop is asked for and dropped again by invalidate().
+    def __init__(self):
+        # Invalidations from other workers are best-effort datagrams, so the
+        # TTL is what bounds staleness when one is lost: keep it short
+        self._cache = TTLCache(
+            maxsize=int(os.getenv('KILO_PRICE_CACHE_SIZE', '4096')),
+            ttl=float(os.getenv('KILO_PRICE_CACHE_TTL', '30'))
+        )
+        # Tier changes made by other workers arrive over the bus
+        invalidation_bus.subscribe('kilo_prices', self._apply_remote)
+
+    def _load(self, shop_id):
+        conn = create_connection()
+        if not conn:
+            raise RuntimeError('Database connection failed')
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT min_kilo, max_kilo, price_per_kilo
+                FROM kilo_prices
+                WHERE shop_id = %s
+                ORDER BY min_kilo
+            """, (shop_id,))
+            rows = cursor.fetchall()
+        finally:
+            if conn.is_connected():
+                cursor.close()
+                conn.close()
+
+        tiers = [
+            {
+                'min_kilo': float(row[0]),
+                'max_kilo': float(row[1]),
+                'price_per_kilo': float(row[2])
+            }
+            for row in rows
+        ]
+        return [tier['min_kilo'] for tier in tiers], tiers
+
+    def _entry(self, shop_id):
+        shop_id = int(shop_id)
+        return self._cache.get_or_load(shop_id, lambda: self._load(shop_id))
+
+    def tiers(self, shop_id):
+        return list(self._entry(shop_id)[1])
+
+    def lookup(self, shop_id, kilo):
+        starts, tiers = self._entry(shop_id)
+        kilo = float(kilo)
+        position = bisect_right(starts, kilo) - 1
+        if position >= 0 and kilo <= tiers[position]['max_kilo']:
+            return tiers[position]
+        return None
+
+    def invalidate(self, shop_id):
+        self._cache.invalidate(int(shop_id))
+        invalidation_bus.publish('kilo_prices', [int(shop_id)])
+
+    def _apply_remote(self, shop_ids):
+        if shop_ids is None:
+            self._cache.clear()
+        else:
+            self._cache.invalidate(*shop_ids)
+
+    def stats(self):
+        return self._cache.stats()
+
+kilo_price_index = KiloPriceIndex()
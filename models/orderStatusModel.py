@@ -0,0 +1,91 @@
+PENDING = 'Pending'
+PROCESSING = 'Processing'
+COMPLETED = 'Completed'
+CANCELLED = 'Cancelled'
+
+STATUSES = (PENDING, PROCESSING, COMPLETED, CANCELLED)
+
+# Where an order may go from each status. Completed and Cancelled are final.
+TRANSITIONS = {
+    PENDING: (PROCESSING, CANCELLED),
+    PROCESSING: (COMPLETED, CANCELLED),
+    COMPLETED: (),
+    CANCELLED: (),
+}
+
+_CANONICAL = {status.lower(): status for status in STATUSES}
+
+# user_id and shop_id come back packed into LAST_INSERT_ID(), which MySQL
+# reports as the statement's lastrowid: the UPDATE both checks the current
+# status and returns the ids, with no SELECT before or after it. The call
+# rides on the status assignment (the packed value is never negative, so
+# the CASE always yields the new status); no other column is touched and
+# the rollup triggers see only the real change.
+_ID_SHIFT = 4294967296
+
+TRANSITION_UPDATE = """
+    UPDATE transactions
+    SET status = CASE WHEN LAST_INSERT_ID(user_id * {} + shop_id) >= 0 THEN %s END{}
+    WHERE id = %s AND status IN ({})
+"""
+
+def normalize(status):
+    # 'processing' -> 'Processing'; ValueError for anything else
+    canonical = _CANONICAL.get(str(status).strip().lower())
+    if canonical is None:
+        raise ValueError(f'Unknown status: {status}')
+    return canonical
+
+def sources(target):
+    return tuple(status for status, targets in TRANSITIONS.items() if target in targets)
+
+def transition(cursor, transaction_id, target, allowed_from=None, assignments=None):
+    # Moves one order to target in a single conditional UPDATE. allowed_from
+    # defaults to every status with an edge to target; assignments is a
+    # dict of extra columns to set in the same statement. Returns the same
+    # shape the controllers do: 200 with user_id/shop_id, 404 or 409.
+    # The caller commits.
+    target = normalize(target)
+    allowed_from = tuple(allowed_from) if allowed_from is not None else sources(target)
+    if not allowed_from:
+        return {'status': 409, 'message': f'No order can be moved to {target}'}
+    assignments = assignments or {}
+
+    query = TRANSITION_UPDATE.format(
+        _ID_SHIFT,
+        ''.join(f', {column} = %s' for column in assignments),
+        ', '.join(['%s'] * len(allowed_from))
+    )
+    params = (target, *assignments.values(), transaction_id, *allowed_from)
+
+    # Nothing matched means no such order or the wrong state, and only
+    # that path pays for a SELECT. If the SELECT finds an allowed status
+    # the order moved between the two statements: retry the UPDATE once,
+    # and never report a change that was not applied.
+    for attempt in range(2):
+        cursor.execute(query, params)
+        packed = cursor.lastrowid
+        if packed:
+            user_id, shop_id = divmod(packed, _ID_SHIFT)
+            return {'status': 200, 'user_id': user_id, 'shop_id': shop_id, 'new_status': target}
+
+        cursor.execute("SELECT status FROM transactions WHERE id = %s", (transaction_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return {'status': 404, 'message': 'Transaction not found'}
+        current = normalize(row['status'] if isinstance(row, dict) else row[0])
+        if current not in allowed_from:
+            break
+
+    if current in allowed_from:
+        return {
+            'status': 409,
+            'message': f'Order {transaction_id} changed concurrently, please retry',
+            'current_status': current
+        }
+    return {
+        'status': 409,
+        'message': f'Order is already {current}' if current == target
+                   else f'Cannot change status from {current} to {target}',
+        'current_status': current
+    }
@@ -0,0 +1,40 @@
+import contextlib
+import io
+import os
+import sys
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import dataset, standin
+
+@pytest.fixture(scope='session')
+def standin_db(tmp_path_factory):
+    # A small seeded dataset behind the SQLite stand-in, shared by the
+    # whole session; tests that write create their own rows
+    path = str(tmp_path_factory.mktemp('standin') / 'labaride.sqlite3')
+    dataset.build(path, users=300, shops=5, transactions=300, notifications=20, log=lambda message: None)
+    standin.install(path)
+    return path
+
+@pytest.fixture(scope='session')
+def server(standin_db):
+    os.environ.setdefault('CACHE_BUS', 'local')
+    # The routes print on socket joins and most errors
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    return app
+
+@pytest.fixture
+def auth_header(server):
+    def header(user_id):
+        token = jwt.encode({
+            'user_id': user_id,
+            'email': f'user{user_id}@example.com',
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, server.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+    return header
@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache import TTLCache
+
+class SlowLoader:
+    # Loader that blocks until released, returning what the "database"
+    # held when it read
+    def __init__(self, db):
+        self.db = db
+        self.reading = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        value = self.db['value']
+        self.reading.set()
+        assert self.release.wait(5)
+        return value
+
+def start_load(cache, key, loader):
+    thread = threading.Thread(target=cache.get_or_load, args=(key, loader))
+    thread.start()
+    assert loader.reading.wait(5)
+    return thread
+
+def test_invalidate_during_load_keeps_stale_value_out():
+    cache, db = TTLCache(), {'value': 'old'}
+    loader = SlowLoader(db)
+    thread = start_load(cache, ('shop_services', 1), loader)
+    # Writer commits and invalidates while the read is in flight
+    db['value'] = 'new'
+    cache.invalidate(('shop_services', 1))
+    loader.release.set()
+    thread.join()
+    assert cache.get(('shop_services', 1)) is None
+    assert cache.get_or_load(('shop_services', 1), lambda: db['value']) == 'new'
+    assert cache._fills == {}
+
+def test_invalidate_between_two_loaders_of_one_key():
+    cache, db = TTLCache(), {'value': 'old'}
+    first = SlowLoader(db)
+    first_thread = start_load(cache, 'k', first)
+    db['value'] = 'new'
+    cache.invalidate('k')
+    # Started after the write, so its value may be cached
+    second = SlowLoader(db)
+    second_thread = start_load(cache, 'k', second)
+    second.release.set()
+    second_thread.join()
+    first.release.set()
+    first_thread.join()
+    assert cache.get('k') == 'new'
+    assert cache._fills == {}
+
+def test_invalidate_racing_the_end_of_a_load():
+    # A write + invalidate() squeezed into any lock hand-off after the
+    # load's fill entry is gone must still keep the old value out
+    cache, db = TTLCache(), {'value': 'old'}
+    real_lock = cache._lock
+    fired = []
+
+    class HookedLock:
+        def __enter__(self):
+            if not fired and 'k' not in cache._fills and db['value'] == 'old' and loading:
+                fired.append(True)
+                db['value'] = 'new'
+                cache._lock = real_lock
+                cache.invalidate('k')
+            return real_lock.__enter__()
+
+        def __exit__(self, *exc):
+            return real_lock.__exit__(*exc)
+
+    loading = []
+    def loader():
+        loading.append(True)
+        return db['value']
+
+    cache._lock = HookedLock()
+    cache.get_or_load('k', loader)
+    cache._lock = real_lock
+    assert cache.get('k') in (None, db['value'])
+
+def test_invalidate_of_other_key_does_not_drop_fill():
+    cache, db = TTLCache(), {'value': 'v'}
+    loader = SlowLoader(db)
+    thread = start_load(cache, 'a', loader)
+    cache.invalidate('b')
+    loader.release.set()
+    thread.join()
+    assert cache.get('a') == 'v'
+
+def test_failed_load_cleans_up():
+    cache = TTLCache()
+    def boom():
+        raise RuntimeError('db down')
+    try:
+        cache.get_or_load('k', boom)
+    except RuntimeError:
+        pass
+    assert cache._fills == {} and cache.get('k') is None
@@ -0,0 +1,108 @@
+import uuid
+
+import pytest
+
+from database.connection import fetch_one, get_connection
+
+ORDER = {
+    'shop_id': 1,
+    'services': ['Wash and Fold'],
+    'kilo_amount': 3,
+    'subtotal': 120,
+    'delivery_fee': 50,
+    'voucher_discount': 0,
+    'total_amount': 170,
+    'delivery_type': 'Delivery',
+    'zone': 'Zone 3',
+    'street': 'Rizal St',
+    'barangay': 'Barangay 12',
+    'building': 'House',
+    'scheduled_date': '2026-10-20',
+    'scheduled_time': '10:00:00',
+    'notes': 'idempotency test',
+}
+USER_ID = 150
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+@pytest.fixture
+def post(client, auth_header):
+    def post(key, body=ORDER):
+        headers = dict(auth_header(USER_ID), **{'Idempotency-Key': key})
+        return client.post(f'/create_transaction/{USER_ID}', json=body, headers=headers)
+    return post
+
+def order_count():
+    return fetch_one("SELECT COUNT(*) AS total FROM transactions WHERE user_id = %s", (USER_ID,))['total']
+
+def mark_processing(key, age_seconds):
+    # As if the request that owns the key were still running, or had died
+    # age_seconds ago without completing or releasing it
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE idempotency_keys
+            SET status = 'processing', response_status = NULL, response_body = NULL,
+                created_at = NOW() - INTERVAL %s SECOND
+            WHERE user_id = %s AND idempotency_key = %s
+        """, (age_seconds, USER_ID, key))
+        conn.commit()
+        cursor.close()
+
+def test_retry_replays_the_first_response(post):
+    key = uuid.uuid4().hex
+    before = order_count()
+    first = post(key)
+    assert first.status_code == 201
+    again = post(key)
+    assert again.status_code == 201
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json() == first.get_json()
+    assert order_count() == before + 1
+
+def test_key_reused_for_another_body_is_rejected(post):
+    key = uuid.uuid4().hex
+    assert post(key).status_code == 201
+    before = order_count()
+    response = post(key, dict(ORDER, notes='something else'))
+    assert response.status_code == 422
+    assert order_count() == before
+
+def test_key_still_processing_answers_409(post):
+    key = uuid.uuid4().hex
+    assert post(key).status_code == 201
+    mark_processing(key, age_seconds=0)
+    before = order_count()
+    response = post(key)
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert order_count() == before
+
+def test_stale_processing_key_is_taken_over(server, post):
+    key = uuid.uuid4().hex
+    assert post(key).status_code == 201
+    mark_processing(key, age_seconds=server.idempotency_controller.lease + 30)
+    before = order_count()
+    response = post(key)
+    assert response.status_code == 201
+    assert order_count() == before + 1
+    assert post(key).headers.get('Idempotent-Replayed') == 'true'
+
+def test_failed_complete_still_returns_the_order(server, post, monkeypatch):
+    calls = []
+    def broken_complete(*args):
+        calls.append(args)
+        raise RuntimeError('pool timeout')
+    monkeypatch.setattr(server.idempotency_controller, 'complete', broken_complete)
+    key = uuid.uuid4().hex
+    before = order_count()
+    response = post(key)
+    assert response.status_code == 201
+    assert response.get_json()['transaction_id']
+    assert len(calls) == 2
+    monkeypatch.undo()
+    # The key is still 'processing': within the lease a retry is held off
+    assert post(key).status_code == 409
+    assert order_count() == before + 1
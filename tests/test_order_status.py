@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from database.connection import fetch_one, get_connection
+from models import orderStatusModel as order_status
+
+def order_in(status):
+    # A fresh order in the given status, so tests never share rows
+    row = fetch_one("SELECT id, user_id, shop_id FROM transactions WHERE status = 'Pending' ORDER BY id LIMIT 1")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE transactions SET status = %s WHERE id = %s", (status, row['id']))
+        conn.commit()
+        cursor.close()
+    return row
+
+def transition(transaction_id, target, **kwargs):
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        result = order_status.transition(cursor, transaction_id, target, **kwargs)
+        conn.commit()
+        cursor.close()
+    return result
+
+def status_of(transaction_id):
+    return fetch_one("SELECT status FROM transactions WHERE id = %s", (transaction_id,))['status']
+
+@pytest.mark.parametrize('start, target', [
+    ('Pending', 'Processing'),
+    ('Pending', 'Cancelled'),
+    ('Processing', 'Completed'),
+    ('Processing', 'Cancelled'),
+])
+def test_allowed_moves(standin_db, start, target):
+    order = order_in(start)
+    result = transition(order['id'], target)
+    assert result == {'status': 200, 'user_id': order['user_id'], 'shop_id': order['shop_id'],
+                      'new_status': target}
+    assert status_of(order['id']) == target
+
+@pytest.mark.parametrize('start, target', [
+    ('Pending', 'Completed'),
+    ('Processing', 'Pending'),
+    ('Completed', 'Cancelled'),
+    ('Completed', 'Processing'),
+    ('Cancelled', 'Processing'),
+])
+def test_forbidden_moves(standin_db, start, target):
+    order = order_in(start)
+    result = transition(order['id'], target)
+    assert result['status'] == 409
+    assert result.get('current_status', start) == start
+    assert status_of(order['id']) == start
+
+def test_same_status_is_a_conflict(standin_db):
+    order = order_in('Processing')
+    result = transition(order['id'], 'processing')
+    assert result == {'status': 409, 'message': 'Order is already Processing', 'current_status': 'Processing'}
+
+def test_missing_order_is_404_not_409(standin_db):
+    assert transition(99999999, 'Cancelled') == {'status': 404, 'message': 'Transaction not found'}
+
+def test_assignments_land_in_the_same_update(standin_db):
+    order = order_in('Pending')
+    result = transition(order['id'], 'Processing', allowed_from=('Pending', 'Processing'),
+                        assignments={'price_per_kilo': 42})
+    assert result['status'] == 200
+    row = fetch_one("SELECT status, price_per_kilo FROM transactions WHERE id = %s", (order['id'],))
+    assert (row['status'], float(row['price_per_kilo'])) == ('Processing', 42.0)
+
+def test_packed_ids_round_trip(standin_db):
+    # Largest ids the INT columns hold: the packed value still fits the
+    # 64-bit LAST_INSERT_ID() and neither half bleeds into the other
+    order = order_in('Pending')
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE transactions SET user_id = %s, shop_id = %s WHERE id = %s",
+                       (2147483647, 2147483647, order['id']))
+        conn.commit()
+        cursor.close()
+    result = transition(order['id'], 'Processing')
+    assert (result['user_id'], result['shop_id']) == (2147483647, 2147483647)
+    row = fetch_one("SELECT user_id, shop_id FROM transactions WHERE id = %s", (order['id'],))
+    assert (row['user_id'], row['shop_id']) == (2147483647, 2147483647)
+
+def test_cancel_racing_complete_loses_cleanly(standin_db):
+    # The shop completes while the customer cancels; whichever commits
+    # second must see the first one's status, not overwrite it
+    order = order_in('Processing')
+    results = {}
+    with get_connection() as first:
+        cursor = first.cursor(dictionary=True)
+        results['complete'] = order_status.transition(cursor, order['id'], 'Completed')
+
+        def cancel():
+            results['cancel'] = transition(order['id'], 'Cancelled')
+        racer = threading.Thread(target=cancel)
+        racer.start()
+        # The cancel is now waiting on the uncommitted complete
+        time.sleep(0.2)
+        first.commit()
+        cursor.close()
+    racer.join(10)
+    assert results['complete']['status'] == 200
+    assert results['cancel'] == {'status': 409, 'message': 'Cannot change status from Completed to Cancelled',
+                                 'current_status': 'Completed'}
+    assert status_of(order['id']) == 'Completed'
+
+def test_controller_reports_transition_conflicts(standin_db):
+    from controllers.transactionController import TransactionController
+    controller = TransactionController()
+    order = order_in('Processing')
+    assert controller.update_transaction_status(order['id'], 'Processing')['status'] == 409
+    assert controller.update_transaction_status(order['id'], 'bogus')['status'] == 400
+    assert controller.update_transaction_status(order['id'], 'completed')['status'] == 200
+    assert controller.cancel_transaction(order['id'], 'changed mind')['status'] == 409
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import simple_websocket
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+from werkzeug.serving import make_server
+from utils.realtime import UnixSocketManager, socketio_queue_options
+
+# Worker A: its own process and its own SocketIO server, with no clients,
+# emitting the way TransactionController's callers do
+WORKER_A = textwrap.dedent("""
+    import sys
+    sys.path.insert(0, sys.argv[1])
+    from flask import Flask
+    from flask_socketio import SocketIO
+    from utils.realtime import socketio_queue_options
+
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading', **socketio_queue_options())
+    socketio.emit('new_transaction', {'transaction_id': 42, 'shop_id': 1}, room='shop_1')
+    socketio.emit('new_transaction', {'transaction_id': 43, 'shop_id': 2}, room='shop_2')
+""")
+
+def make_worker():
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading', **socketio_queue_options())
+
+    @socketio.on('join_shop_room')
+    def join_shop(data):
+        join_room(f"shop_{data['shop_id']}")
+
+    return app, socketio
+
+def serve(app):
+    # Flask-SocketIO's test client refuses message queues, so worker B is
+    # a real server on an ephemeral port
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def connect(port):
+    # Bare Engine.IO v4 / Socket.IO v5 over a websocket
+    ws = simple_websocket.Client.connect(f'ws://127.0.0.1:{port}/socket.io/?EIO=4&transport=websocket')
+    assert ws.receive(5).startswith('0')
+    ws.send('40')
+    assert ws.receive(5).startswith('40')
+    return ws
+
+def receive_events(ws, seconds):
+    events = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        message = ws.receive(0.2)
+        if message is None:
+            continue
+        if message == '2':
+            ws.send('3')
+        elif message.startswith('42'):
+            events.append(json.loads(message[2:]))
+    return events
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_unix_queue_delivers_emit_from_another_worker(tmp_path, monkeypatch):
+    monkeypatch.setenv('SOCKETIO_MESSAGE_QUEUE', 'unix')
+    monkeypatch.setenv('SOCKETIO_QUEUE_DIR', str(tmp_path))
+
+    # Worker B holds the client, joined to shop_1 only
+    app, socketio = make_worker()
+    assert isinstance(socketio.server.manager, UnixSocketManager)
+    server = serve(app)
+    ws = connect(server.server_port)
+    try:
+        ws.send('42' + json.dumps(['join_shop_room', {'shop_id': 1}]))
+        channel = tmp_path / 'socketio'
+        assert wait_for(lambda: channel.is_dir() and any(channel.glob('*.sock')))
+
+        subprocess.run([sys.executable, '-c', WORKER_A, ROOT], check=True, env=os.environ.copy(), timeout=30)
+
+        events = [args for args in receive_events(ws, 2.0) if args[0] == 'new_transaction']
+        assert [args[1]['transaction_id'] for args in events] == [42]
+        assert events[0][1]['shop_id'] == 1
+    finally:
+        ws.close()
+        server.shutdown()
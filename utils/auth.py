@@ -0,0 +1,45 @@
+import hashlib
+import logging
+import os
+import time
+import jwt
+from utils.cache import TTLCache
+
+logger = logging.getLogger('labaride.auth')
+
+class TokenCache:
+    # Bounded LRU of already verified tokens. Entries are keyed by a digest
+    # of secret + token (never the raw token) and never outlive the token's
+    # own exp claim.
+    def __init__(self, maxsize=4096, ttl=300.0, algorithms=("HS256",)):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.algorithms = list(algorithms)
+
+    def decode(self, token, secret):
+        digest = hashlib.sha256(secret.encode('utf-8') + b'\0' + token.encode('utf-8')).digest()
+        now = time.time()
+
+        cached = self._cache.get(digest)
+        if cached is not None:
+            claims, exp = cached
+            if exp is None or exp > now:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('token cache hit digest=%s user_id=%s', digest[:6].hex(), claims.get('user_id'))
+                return dict(claims)
+
+        # Raises jwt.InvalidTokenError (including expiry) like before
+        claims = jwt.decode(token, secret, algorithms=self.algorithms)
+        exp = claims.get('exp')
+        ttl = self._cache.ttl if exp is None else min(self._cache.ttl, exp - now)
+        self._cache.set(digest, (claims, exp), ttl=ttl)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('token verified digest=%s user_id=%s exp=%s', digest[:6].hex(), claims.get('user_id'), exp)
+        return dict(claims)
+
+    def stats(self):
+        return self._cache.stats()
+
+token_cache = TokenCache(
+    maxsize=int(os.getenv('JWT_CACHE_SIZE', '4096')),
+    ttl=float(os.getenv('JWT_CACHE_TTL', '300'))
+)
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    # Thread-safe LRU with a per-entry time to live. Keys are tuples such as
+    # ('shop_services', 3); values are whatever the loader returned and must
+    # be treated as read-only by callers.
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        # key -> [loads in flight, version] for keys being loaded right
+        # now. Invalidating a key bumps its version so a load that started
+        # before cannot put the old value back; entries go away when the
+        # last load finishes, so this stays as small as the number of
+        # concurrent fills.
+        self._fills = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expirations': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._stats['misses'] += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl):
+        # Caller holds the lock
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get_or_load(self, key, loader, ttl=None):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            fill = self._fills.setdefault(key, [0, 0])
+            fill[0] += 1
+            version = fill[1]
+        ttl = self.ttl if ttl is None else ttl
+        loaded = False
+        try:
+            value = loader()
+            loaded = True
+        finally:
+            # Version check, store and cleanup under one lock: an
+            # invalidate() between them would find no fill to bump and
+            # let a value read before the write back in
+            with self._lock:
+                if loaded and fill[1] == version and ttl > 0:
+                    self._store(key, value, ttl)
+                fill[0] -= 1
+                if not fill[0]:
+                    del self._fills[key]
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                fill = self._fills.get(key)
+                if fill is not None:
+                    fill[1] += 1
+                if self._data.pop(key, _MISSING) is not _MISSING:
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            for fill in self._fills.values():
+                fill[1] += 1
+            self._stats['invalidations'] += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+            stats['maxsize'] = self.maxsize
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
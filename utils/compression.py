@@ -0,0 +1,105 @@
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+    'text/html',
+)
+
+def _gzip_compressor(level):
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+def gzip_body(data, level):
+    compressor = _gzip_compressor(level)
+    return compressor.compress(data) + compressor.flush()
+
+def brotli_body(data, quality):
+    return brotli.compress(data, quality=quality)
+
+def _gzip_stream(chunks, level):
+    # Sync flush after every chunk so a streamed export reaches the client
+    # as it is produced instead of when the deflate window fills
+    compressor = _gzip_compressor(level)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+def choose_encoding(accept_encodings):
+    # Highest client preference wins; brotli on a tie when installed
+    best, best_quality = None, 0
+    for encoding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.getenv('COMPRESS_MIN_SIZE', '1024')))
+    app.config.setdefault('COMPRESS_LEVEL', int(os.getenv('COMPRESS_LEVEL', '6')))
+    app.config.setdefault('COMPRESS_BR_LEVEL', int(os.getenv('COMPRESS_BR_LEVEL', '4')))
+    app.config.setdefault('COMPRESS_MIMETYPES', COMPRESSIBLE_MIMETYPES)
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in app.config['COMPRESS_MIMETYPES']:
+            return response
+        # The body depends on Accept-Encoding from here on, even when this
+        # particular response goes out uncompressed
+        response.vary.add('Accept-Encoding')
+        if (request.method == 'HEAD'
+                or response.status_code < 200
+                or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.direct_passthrough
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            if encoding == 'br':
+                response.response = _brotli_stream(response.response, app.config['COMPRESS_BR_LEVEL'])
+            else:
+                response.response = _gzip_stream(response.response, app.config['COMPRESS_LEVEL'])
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < app.config['COMPRESS_MIN_SIZE']:
+                return response
+            if encoding == 'br':
+                response.set_data(brotli_body(body, app.config['COMPRESS_BR_LEVEL']))
+            else:
+                response.set_data(gzip_body(body, app.config['COMPRESS_LEVEL']))
+
+        response.headers['Content-Encoding'] = encoding
+        # A strong validator must change with the bytes; ours are weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
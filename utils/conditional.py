@@ -0,0 +1,66 @@
+import hashlib
+import json
+from datetime import timezone
+from functools import wraps
+from flask import current_app, request
+from utils.serialization import encode_value
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+def payload_digest(value):
+    # Stable across workers, so every worker hands out the same ETag
+    raw = json.dumps(value, default=encode_value, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def _as_utc(moment):
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.replace(microsecond=0)
+
+def _not_modified(etag):
+    # Only If-None-Match decides. Last-Modified goes out in whole seconds
+    # while updated_at has milliseconds, so If-Modified-Since would answer
+    # 304 for a second write within the same second; every resource here
+    # has an ETag built from the full version, so If-Modified-Since is
+    # ignored rather than trusted.
+    return bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+def conditional(validator):
+    # Opt-in conditional GET for a view. validator(**view_kwargs) returns
+    # (version, last_modified) from something cheap (counts, MAX(updated_at),
+    # a cached digest) or None to skip. The ETag covers the path and query
+    # string, so each filter combination gets its own. Must sit below
+    # jwt_required so unauthenticated clients never learn a version.
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            try:
+                validators = validator(**kwargs)
+            except Exception as e:
+                print(f"Error computing validator for {request.path}: {e}")
+                validators = None
+            if validators is None:
+                return f(*args, **kwargs)
+
+            version, last_modified = validators
+            etag = make_etag(request.full_path, version)
+            last_modified = _as_utc(last_modified)
+            if _not_modified(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Clients may keep the body but must revalidate every time
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,9 @@
+import sys
+
+def is_patched():
+    # True once gevent has monkey-patched the standard library (gunicorn's
+    # gevent worker or wsgi.py). Threads are then greenlets on one OS
+    # thread, so blocking C calls must go to a real thread pool and MySQL
+    # must use the pure Python protocol to yield on socket I/O.
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+from utils.green import is_patched
+
+class HasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    # Runs bcrypt (and other slow password hashes) on a small dedicated
+    # thread pool. bcrypt releases the GIL, so request threads keep serving
+    # while a hash is computed. At most workers + max_pending jobs are
+    # admitted; anything beyond that is rejected straight away instead of
+    # queueing behind a login burst.
+    def __init__(self, workers=2, max_pending=8, rounds=12, timeout=10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._stats = {
+            'completed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'hash_time_total': 0.0,
+            'hash_time_max': 0.0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+        self._observers = []
+
+    def _get_executor(self):
+        # Threads do not survive a fork; each worker gets its own pool
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    if is_patched():
+                        # Patched threads are greenlets; bcrypt needs real ones
+                        from gevent.threadpool import ThreadPoolExecutor as executor_class
+                        self._executor = executor_class(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix='password-hasher'
+                        )
+                    self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def add_observer(self, callback):
+        # callback(hash_seconds, wait_seconds) after every completed job
+        self._observers.append(callback)
+
+    def run(self, fn, *args, **kwargs):
+        executor = self._get_executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HasherBusy('Password hashing queue is full')
+
+        queued_at = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(time.monotonic() - started, started - queued_at)
+
+        try:
+            future = executor.submit(job)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Same answer as a full queue: callers already turn it into a
+            # 503. A job still waiting for a thread is dropped; one that is
+            # running finishes and frees its slot on its own.
+            future.cancel()
+            with self._lock:
+                self._stats['timed_out'] += 1
+            raise HasherBusy(f'Password hashing took longer than {self.timeout:g}s')
+
+    def hash(self, password):
+        if isinstance(password, str):
+            password = password.encode('utf-8')
+        return self.run(lambda: bcrypt.hashpw(password, bcrypt.gensalt(self.rounds)))
+
+    def check(self, password, hashed):
+        if isinstance(password, str):
+            password = password.encode('utf-8')
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return self.run(bcrypt.checkpw, password, hashed)
+
+    def _record(self, hash_seconds, wait_seconds):
+        with self._lock:
+            stats = self._stats
+            stats['completed'] += 1
+            stats['hash_time_total'] += hash_seconds
+            stats['hash_time_max'] = max(stats['hash_time_max'], hash_seconds)
+            stats['wait_time_total'] += wait_seconds
+            stats['wait_time_max'] = max(stats['wait_time_max'], wait_seconds)
+        for callback in self._observers:
+            callback(hash_seconds, wait_seconds)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats['completed']
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'rounds': self.rounds,
+            'completed': completed,
+            'rejected': stats['rejected'],
+            'timed_out': stats['timed_out'],
+            'avg_hash_ms': round(stats['hash_time_total'] * 1000 / completed, 3) if completed else 0.0,
+            'max_hash_ms': round(stats['hash_time_max'] * 1000, 3),
+            'avg_wait_ms': round(stats['wait_time_total'] * 1000 / completed, 3) if completed else 0.0,
+            'max_wait_ms': round(stats['wait_time_max'] * 1000, 3),
+        }
+
+password_hasher = PasswordHasher(
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+    max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', '8')),
+    rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+    timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+)
@@ -0,0 +1,140 @@
+import atexit
+import glob
+import json
+import os
+import socket
+import threading
+
+class LocalBackend:
+    # Single-process stand-in: nothing to broadcast to. Used when only one
+    # worker runs, on platforms without UNIX sockets, and in tests.
+    def start(self, deliver):
+        pass
+
+    def send(self, payload):
+        pass
+
+    def stop(self):
+        pass
+
+class UnixSocketBackend:
+    # Every worker binds a datagram socket named after its pid in a shared
+    # directory. Publishing is a non-blocking sendto() to every other socket
+    # there; a daemon thread per worker receives and applies invalidations.
+    def __init__(self, directory):
+        self.directory = directory
+        self._sock = None
+        self._path = None
+        self._thread = None
+
+    def start(self, deliver):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._path = os.path.join(self.directory, f'{os.getpid()}.sock')
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self._path)
+        self._thread = threading.Thread(
+            target=self._listen, args=(self._sock, deliver),
+            name='cache-invalidation-bus', daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _listen(self, sock, deliver):
+        while True:
+            try:
+                payload = sock.recv(65536)
+            except OSError:
+                return
+            try:
+                deliver(payload)
+            except Exception as e:
+                print(f"Error applying cache invalidation: {e}")
+
+    def send(self, payload):
+        sender = self._sock
+        for path in glob.glob(os.path.join(self.directory, '*.sock')):
+            if path == self._path:
+                continue
+            try:
+                sender.sendto(payload, socket.MSG_DONTWAIT, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker is gone; clean up after it
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except (BlockingIOError, OSError):
+                # Receiver is not draining its socket (e.g. a preloaded
+                # master); dropping is safe since entries also expire,
+                # which is why the caches behind the bus keep short TTLs.
+                pass
+
+    def stop(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+
+class InvalidationBus:
+    # Broadcasts cache-key invalidations to every worker on the host. The
+    # publisher is expected to have invalidated its own cache already;
+    # subscribers only see invalidations coming from other workers.
+    def __init__(self, backend_factory):
+        self._backend_factory = backend_factory
+        self._backend = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channel, callback):
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def ensure_started(self):
+        # Sockets and threads do not survive a fork, so each worker starts
+        # its own backend the first time it is used.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            backend = self._backend_factory()
+            try:
+                backend.start(self._deliver)
+            except OSError as e:
+                print(f"Cache invalidation bus unavailable, falling back to local: {e}")
+                backend = LocalBackend()
+            self._backend = backend
+            self._pid = os.getpid()
+
+    def publish(self, channel, keys=None):
+        # keys=None clears the whole channel
+        self.ensure_started()
+        message = {'channel': channel, 'keys': None if keys is None else list(keys)}
+        self._backend.send(json.dumps(message, separators=(',', ':')).encode('utf-8'))
+
+    def _deliver(self, payload):
+        message = json.loads(payload)
+        keys = message['keys']
+        if keys is not None:
+            # JSON turns tuple keys into lists
+            keys = [tuple(key) if isinstance(key, list) else key for key in keys]
+        for callback in self._subscribers.get(message['channel'], []):
+            callback(keys)
+
+    def stop(self):
+        with self._lock:
+            if self._backend is not None:
+                self._backend.stop()
+            self._backend = None
+            self._pid = None
+
+def _backend_from_env():
+    kind = os.getenv('CACHE_BUS', 'unix' if hasattr(socket, 'AF_UNIX') else 'local')
+    if kind == 'unix':
+        return UnixSocketBackend(os.getenv('CACHE_BUS_DIR', '/tmp/labaride-cache-bus'))
+    return LocalBackend()
+
+invalidation_bus = InvalidationBus(_backend_from_env)
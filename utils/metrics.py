@@ -0,0 +1,178 @@
+import os
+import threading
+from bisect import bisect_left
+
+# Prometheus text exposition without the client library. Writers only ever
+# take one of STRIPES locks, picked by OS thread, so request threads rarely
+# meet on the same lock; a scrape walks every stripe and adds them up.
+STRIPES = int(os.getenv('METRICS_STRIPES', '16'))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _stripe():
+    # Native id rather than get_ident(): under gevent every greenlet gets
+    # its own ident, but greenlets on one hub never interleave a +=
+    return threading.get_native_id() % STRIPES
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Striped:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._locks = [threading.Lock() for _ in range(STRIPES)]
+        self._shards = [{} for _ in range(STRIPES)]
+
+
+class Counter(_Striped):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        i = _stripe()
+        with self._locks[i]:
+            shard = self._shards[i]
+            shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self):
+        totals = {}
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                items = list(shard.items())
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self):
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+                for labels, value in sorted(self.values().items())]
+
+
+class Histogram(_Striped):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        # One slot per bucket plus +Inf, then sum and count
+        i = _stripe()
+        slot = bisect_left(self.buckets, value)
+        with self._locks[i]:
+            shard = self._shards[i]
+            row = shard.get(labels)
+            if row is None:
+                row = shard[labels] = [0] * (len(self.buckets) + 3)
+            row[slot] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def values(self):
+        totals = {}
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                items = [(labels, list(row)) for labels, row in shard.items()]
+            for labels, row in items:
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = row
+                else:
+                    for j, value in enumerate(row):
+                        total[j] += value
+        return totals
+
+    def render(self):
+        lines = []
+        bounds = self.buckets + (float('inf'),)
+        for labels, row in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                lines.append(f'{self.name}_bucket'
+                             f'{_labels(self.labelnames, labels, ("le", _number(bound)))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(row[-2])}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {row[-1]}')
+        return lines
+
+
+class Gauge(Counter):
+    # Up/down gauge for things the process tracks itself
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class GaugeCallback:
+    # Gauge read from somewhere else at scrape time. fn returns a number,
+    # or a dict of label tuple -> number when there are labels.
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self):
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+                for labels, value in sorted(values.items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge_callback(self, name, help, fn, labelnames=()):
+        return self.register(GaugeCallback(name, help, fn, labelnames))
+
+    def render(self):
+        out = []
+        for metric in self._metrics:
+            try:
+                lines = metric.render()
+            except Exception as e:
+                # One broken callback must not take the whole scrape down
+                print(f"Error collecting metric {metric.name}: {e}")
+                continue
+            out.append(f'# HELP {metric.name} {metric.help}')
+            out.append(f'# TYPE {metric.name} {metric.kind}')
+            out.extend(lines)
+        return '\n'.join(out) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,367 @@
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+import socketio
+from socketio import Manager, PubSubManager
+from utils.serialization import encode_value
+
+# Running more than one gunicorn worker for the Socket.IO server needs two
+# things:
+#
+# 1. Sticky sessions. A Socket.IO session lives in the worker that accepted
+#    its handshake, and long-polling clients send several HTTP requests per
+#    session. The load balancer has to keep a client on one worker (nginx
+#    "ip_hash" or a cookie based upstream, ALB stickiness, ...). Gunicorn
+#    itself cannot do this, so with several workers behind one gunicorn
+#    either force clients onto the websocket transport or run one gunicorn
+#    per port and balance across ports.
+# 2. A message queue, so an emit made in worker A reaches sockets held by
+#    worker B. SOCKETIO_MESSAGE_QUEUE selects it:
+#      unset         in-process rooms only (single worker, the old behaviour)
+#      unix          workers on this host relay emits over UNIX sockets
+#      redis://...   any URL Flask-SocketIO understands (redis, amqp, kafka);
+#                    needs that client library installed, works across hosts
+#
+# With the unix backend every worker must share SOCKETIO_QUEUE_DIR.
+#
+# Missed-event replay: every event delivered to a shop_<id> or user_<id>
+# room gets "seq" and "epoch" fields added to its payload. A reconnecting
+# client passes the last ones it saw to join_shop_room / join_user_room
+# ({"shop_id": 3, "epoch": "...", "last_seq": 812}) and gets the events it
+# missed replayed in order, or a resync_required event if they are no
+# longer in the log (or the worker restarted) and it must refetch.
+# room_joined carries the current epoch/seq for a fresh client. Events that
+# arrive while the replay runs may be delivered twice, so clients drop
+# anything with seq <= the last one they processed.
+#
+# Sequence numbers are assigned by the worker that delivers the event to
+# its own sockets, so they stay consistent for a client as long as it stays
+# on that worker (sticky sessions); any other worker has another epoch and
+# answers with resync_required.
+
+logger = logging.getLogger('labaride.realtime')
+
+# Larger than any event we emit; bigger payloads are dropped with an error
+MAX_DATAGRAM = 256 * 1024
+
+LOGGED_ROOM = re.compile(r'^(shop|user)_\d+$')
+LOGGED_EVENTS = ('new_transaction', 'transaction_update', 'status_update')
+
+class RoomEventLog:
+    # Bounded per-room history of delivered events. seq comes from one
+    # counter per process, so it increases within every room; each room
+    # also remembers the newest seq it can no longer replay (floor).
+    def __init__(self, size=200, max_rooms=10000, events=LOGGED_EVENTS):
+        self.size = size
+        self.max_rooms = max_rooms
+        self.events = frozenset(events)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.epoch = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._rooms = OrderedDict()
+
+    def _room(self, room):
+        # Caller holds the lock. A room first seen now has no history
+        # before the current seq, which the floor records.
+        if self._pid != os.getpid():
+            self._reset()
+        entry = self._rooms.get(room)
+        if entry is None:
+            entry = self._rooms[room] = {'floor': self._seq, 'events': deque()}
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        else:
+            self._rooms.move_to_end(room)
+        return entry
+
+    def record(self, event, data, room):
+        # Returns the payload to deliver, stamped when the event is logged
+        if event not in self.events or not isinstance(data, dict) \
+                or not isinstance(room, str) or not LOGGED_ROOM.match(room):
+            return data
+        with self._lock:
+            entry = self._room(room)
+            self._seq += 1
+            data = dict(data, seq=self._seq, epoch=self.epoch)
+            events = entry['events']
+            events.append((self._seq, event, data))
+            if len(events) > self.size:
+                entry['floor'] = events.popleft()[0]
+        return data
+
+    def position(self, room):
+        with self._lock:
+            self._room(room)
+            return {'epoch': self.epoch, 'seq': self._seq}
+
+    def since(self, room, epoch, last_seq):
+        # Events after last_seq in order, or None if some are gone
+        with self._lock:
+            entry = self._room(room)
+            if epoch != self.epoch or last_seq > self._seq or last_seq < entry['floor']:
+                return None
+            return [(event, data) for seq, event, data in entry['events'] if seq > last_seq]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'epoch': self.epoch,
+                'seq': self._seq,
+                'rooms': len(self._rooms),
+                'events': sum(len(entry['events']) for entry in self._rooms.values()),
+            }
+
+room_event_log = RoomEventLog(
+    size=int(os.getenv('EVENT_LOG_SIZE', '200')),
+    max_rooms=int(os.getenv('EVENT_LOG_ROOMS', '10000'))
+)
+
+# Clients that join with {"batch": true} sit in <room>__batch instead of
+# <room> and get one "events" payload per window:
+#   {"room": "shop_3", "events": [{"event": "new_transaction", "data": {...}}]}
+BATCH_SUFFIX = '__batch'
+
+class EmitScheduler:
+    # Coalesces the logged events of a room over a short window into one
+    # "events" packet for the room's batch members in this worker. Also
+    # keeps per-room event rates for /api/debug/realtime.
+    def __init__(self, window=0.05, max_batch=100, max_rooms=10000, rate_window=60.0):
+        self.window = window
+        self.max_batch = max_batch
+        self.max_rooms = max_rooms
+        self.rate_window = rate_window
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._rooms = OrderedDict()
+
+    def add(self, manager, namespace, room, event, data):
+        now = time.monotonic()
+        batch_room = room + BATCH_SUFFIX
+        has_members = bool(manager.rooms.get(namespace, {}).get(batch_room))
+        with self._lock:
+            stats = self._room_stats(room, now)
+            stats['events'] += 1
+            if not has_members:
+                return
+            key = (namespace, batch_room)
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = []
+                manager.server.start_background_task(self._flush_later, manager, key)
+            pending.append({'event': event, 'data': data})
+            full = len(pending) >= self.max_batch
+        if full:
+            self._flush(manager, key)
+
+    def _room_stats(self, room, now):
+        # Caller holds the lock. rate is an exponentially decayed events
+        # per second over rate_window.
+        stats = self._rooms.get(room)
+        if stats is None:
+            stats = self._rooms[room] = {'events': 0, 'batches': 0, 'batched_events': 0, 'rate': 0.0, 'at': now}
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        else:
+            self._rooms.move_to_end(room)
+        stats['rate'] = stats['rate'] * math.exp(-(now - stats['at']) / self.rate_window) + 1.0 / self.rate_window
+        stats['at'] = now
+        return stats
+
+    def _flush_later(self, manager, key):
+        manager.server.sleep(self.window)
+        self._flush(manager, key)
+
+    def _flush(self, manager, key):
+        namespace, batch_room = key
+        room = batch_room[:-len(BATCH_SUFFIX)]
+        with self._lock:
+            events = self._pending.pop(key, None)
+            if not events:
+                return
+            stats = self._rooms.get(room)
+            if stats is not None:
+                stats['batches'] += 1
+                stats['batched_events'] += len(events)
+        # Manager.emit delivers to this worker's sockets only; every worker
+        # batches what it delivers itself
+        Manager.emit(manager, 'events', {'room': room, 'events': events}, namespace, room=batch_room)
+
+    def stats(self, top=20):
+        now = time.monotonic()
+        with self._lock:
+            rooms = [
+                {
+                    'room': room,
+                    'events': stats['events'],
+                    'events_per_sec': round(stats['rate'] * math.exp(-(now - stats['at']) / self.rate_window), 3),
+                    'batches': stats['batches'],
+                    'avg_batch_size': round(stats['batched_events'] / stats['batches'], 2) if stats['batches'] else 0.0,
+                }
+                for room, stats in self._rooms.items()
+            ]
+            pending = sum(len(events) for events in self._pending.values())
+        rooms.sort(key=lambda r: r['events_per_sec'], reverse=True)
+        return {
+            'window_ms': round(self.window * 1000, 1),
+            'tracked_rooms': len(rooms),
+            'pending_events': pending,
+            'rooms': rooms[:top],
+        }
+
+emit_scheduler = EmitScheduler(
+    window=float(os.getenv('EMIT_BATCH_WINDOW_MS', '50')) / 1000,
+    max_batch=int(os.getenv('EMIT_BATCH_MAX', '100')),
+    max_rooms=int(os.getenv('EVENT_LOG_ROOMS', '10000'))
+)
+
+_emit_observers = []
+
+def add_emit_observer(callback):
+    # callback(event, room) for every emit that starts in this worker, once,
+    # however many workers end up delivering it
+    _emit_observers.append(callback)
+
+def _notify_emit(event, room):
+    for callback in _emit_observers:
+        callback(event, room)
+
+def _deliver_locally(manager, event, data, namespace, room):
+    # Called for every emit this worker delivers to its own sockets
+    stamped = room_event_log.record(event, data, room)
+    if stamped is not data:
+        emit_scheduler.add(manager, namespace or '/', room, event, stamped)
+    return stamped
+
+class LoggedManager(Manager):
+    # In-process client manager (no message queue) that logs room events
+    def emit(self, event, data, namespace, room=None, skip_sid=None,
+             callback=None, to=None, **kwargs):
+        _notify_emit(event, to or room)
+        data = _deliver_locally(self, event, data, namespace, to or room)
+        return super().emit(event, data, namespace, room=room, skip_sid=skip_sid,
+                            callback=callback, to=to, **kwargs)
+
+class EventLogMixin:
+    # For PubSubManager subclasses: emits made in this worker and ones
+    # received from the queue both end up in _handle_emit
+    def emit(self, event, data, namespace=None, room=None, skip_sid=None,
+             callback=None, to=None, **kwargs):
+        _notify_emit(event, to or room)
+        return super().emit(event, data, namespace=namespace, room=room, skip_sid=skip_sid,
+                            callback=callback, to=to, **kwargs)
+
+    def _handle_emit(self, message):
+        data = _deliver_locally(self, message['event'], message['data'],
+                                message.get('namespace'), message.get('room'))
+        if data is not message['data']:
+            message = dict(message, data=data)
+        return super()._handle_emit(message)
+
+class UnixSocketManager(EventLogMixin, PubSubManager):
+    # Socket.IO client manager that relays emits between workers on one host
+    # over datagram UNIX sockets, like the cache invalidation bus. Each
+    # listening worker binds <directory>/<channel>/<pid>.sock; publishing is
+    # a non-blocking sendto() to every socket there.
+    name = 'unix'
+
+    def __init__(self, directory, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.directory = os.path.join(directory, channel)
+        self._path = None
+        self._sender = None
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # Sockets do not survive a fork, and workers forked from a preloaded
+        # app would otherwise share host_id and ignore each other's messages
+        if self._pid != os.getpid():
+            self.host_id = uuid.uuid4().hex
+            self._sender = None
+            self._pid = os.getpid()
+
+    def initialize(self):
+        self._check_fork()
+        super().initialize()
+
+    def _sender_socket(self):
+        self._check_fork()
+        if self._sender is None:
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        return self._sender
+
+    def _publish(self, data):
+        payload = json.dumps(data, default=encode_value, separators=(',', ':')).encode('utf-8')
+        if len(payload) > MAX_DATAGRAM:
+            logger.error('socketio message too large bytes=%s method=%s', len(payload), data.get('method'))
+            return
+        sender = self._sender_socket()
+        for path in glob.glob(os.path.join(self.directory, '*.sock')):
+            if path == self._path:
+                continue
+            try:
+                sender.sendto(payload, socket.MSG_DONTWAIT, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker is gone; clean up after it
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError as e:
+                # Receiver is not draining its socket; the event is lost for
+                # the clients on that worker only
+                logger.warning('socketio message dropped path=%s error=%s', path, e)
+
+    def _listen(self):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._path = os.path.join(self.directory, f'{os.getpid()}.sock')
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self._path)
+        atexit.register(self._unlink)
+        while True:
+            payload = sock.recv(MAX_DATAGRAM)
+            try:
+                yield json.loads(payload)
+            except ValueError:
+                logger.warning('socketio message ignored, invalid payload')
+
+    def _unlink(self):
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+
+def _queue_manager_class(url):
+    # Same backend choice Flask-SocketIO makes for message_queue=url
+    if url.startswith(('redis://', 'rediss://', 'valkey://', 'valkeys://')):
+        base = socketio.RedisManager
+    elif url.startswith('kafka'):
+        base = socketio.KafkaManager
+    elif url.startswith('zmq'):
+        base = socketio.ZmqManager
+    else:
+        base = socketio.KombuManager
+    return type(f'Logged{base.__name__}', (EventLogMixin, base), {})
+
+def socketio_queue_options():
+    # Extra keyword arguments for SocketIO(...) picked from the environment
+    queue = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    if not queue:
+        return {'client_manager': LoggedManager()}
+    if queue == 'unix':
+        directory = os.getenv('SOCKETIO_QUEUE_DIR', '/tmp/labaride-socketio')
+        return {'client_manager': UnixSocketManager(directory)}
+    # Flask-SocketIO's channel name, so external emitters keep working
+    return {'client_manager': _queue_manager_class(queue)(queue, channel='flask-socketio')}
@@ -0,0 +1,86 @@
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from flask import current_app, jsonify as flask_jsonify
+from flask.json import JSONEncoder
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # optional fast backend
+    orjson = None
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def format_timedelta(value):
+    # MySQL TIME columns come back as timedelta
+    total_seconds = int(value.total_seconds())
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+def encode_value(o):
+    # One place for the DB types the routes used to convert by hand.
+    # datetime is checked before date since it is a subclass of it.
+    if isinstance(o, datetime):
+        return o.strftime(DATETIME_FORMAT)
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, timedelta):
+        return format_timedelta(o)
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, time):
+        return o.strftime('%H:%M:%S')
+    if isinstance(o, (bytes, bytearray)):
+        return o.decode('utf-8')
+    if isinstance(o, set):
+        return list(o)
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+class RowJSONEncoder(JSONEncoder):
+    def default(self, o):
+        try:
+            return encode_value(o)
+        except TypeError:
+            return super().default(o)
+
+def _orjson_options():
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if current_app.config.get('JSON_SORT_KEYS', True):
+        options |= orjson.OPT_SORT_KEYS
+    if current_app.config.get('JSONIFY_PRETTYPRINT_REGULAR') or current_app.debug:
+        options |= orjson.OPT_INDENT_2
+    return options
+
+def jsonify(*args, **kwargs):
+    # Drop-in for flask.jsonify. Uses orjson when it is installed and
+    # JSON_FAST_BACKEND is on, otherwise Flask with RowJSONEncoder.
+    if orjson is None or not current_app.config.get('JSON_FAST_BACKEND', True):
+        return flask_jsonify(*args, **kwargs)
+
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    elif len(args) == 1:
+        data = args[0]
+    else:
+        data = args or kwargs
+
+    body = orjson.dumps(data, default=encode_value, option=_orjson_options())
+    return current_app.response_class(
+        body + b'\n', mimetype=current_app.config['JSONIFY_MIMETYPE']
+    )
+
+def dumps_line(data):
+    # One compact JSON document plus a newline, for NDJSON streams. Needs no
+    # app context, so it is safe inside a streamed response generator.
+    if orjson is not None:
+        return orjson.dumps(data, default=encode_value, option=(
+            orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        ))
+    return (json.dumps(data, default=encode_value, separators=(',', ':')) + '\n').encode('utf-8')
+
+def init_json(app):
+    app.json_encoder = RowJSONEncoder
+    app.config.setdefault('JSON_FAST_BACKEND', True)
@@ -0,0 +1,20 @@
+# Production entry point: cooperative (gevent) serving for the realtime
+# server, so idle sockets cost a greenlet instead of an OS thread.
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Patching has to happen before anything imports socket/threading. The
+# gunicorn gevent worker patches on its own; doing it here as well keeps
+# --preload and plain `python wsgi.py` safe.
+import os
+
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'gevent')
+
+if os.environ['SOCKETIO_ASYNC_MODE'] == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from app import app, socketio
+
+if __name__ == '__main__':
+    socketio.run(app, host=os.getenv('HOST', '0.0.0.0'), port=int(os.getenv('PORT', '5000')))